@@ -1,5 +1,6 @@
 from django.contrib import admin
-from .models import Categoria, Repuesto, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto
+from django.utils import timezone
+from .models import Categoria, Repuesto, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto, Fitment, Job
 
 
 @admin.register(Categoria)
@@ -14,12 +15,19 @@ class ImagenRepuestoInline(admin.TabularInline):
 	fields = ('image', 'orden')
 
 
+class FitmentInline(admin.TabularInline):
+	model = Fitment
+	extra = 0
+	fields = ('brand', 'model', 'year_from', 'year_to', 'primary')
+	readonly_fields = ('primary',)
+
+
 @admin.register(Repuesto)
 class RepuestoAdmin(admin.ModelAdmin):
 	list_display = ('id', 'name', 'sku', 'category', 'price', 'stock')
 	list_filter = ('category',)
 	search_fields = ('name', 'sku')
-	inlines = [ImagenRepuestoInline]
+	inlines = [ImagenRepuestoInline, FitmentInline]
 
 
 class OrderItemInline(admin.TabularInline):
@@ -62,3 +70,16 @@ class CouponAdmin(admin.ModelAdmin):
 	list_display = ('id', 'code', 'discount_type', 'discount_value', 'active', 'valid_from', 'valid_to', 'times_used')
 	list_filter = ('active', 'discount_type')
 	search_fields = ('code',)
+
+
+@admin.register(Job)
+class JobAdmin(admin.ModelAdmin):
+	list_display = ('id', 'task', 'status', 'attempts', 'max_attempts', 'run_at', 'finished_at')
+	list_filter = ('status', 'task')
+	readonly_fields = ('locked_by', 'locked_at', 'last_error', 'created_at', 'finished_at')
+	actions = ['requeue']
+
+	@admin.action(description='Reencolar los trabajos seleccionados')
+	def requeue(self, request, queryset):
+		updated = queryset.exclude(status='running').update(status='queued', attempts=0, run_at=timezone.now(), finished_at=None)
+		self.message_user(request, f'{updated} trabajos reencolados.')
@@ -0,0 +1,249 @@
+import hashlib
+import threading
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.exceptions import ValidationError
+from django.db import transaction
+from django.db.models import Count, F, Max
+from django.utils.http import http_date, parse_etags, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+CACHE_ALIAS = 'catalog'
+STATS_KEY = 'catalog:stats:{}'
+
+_stats_lock = threading.Lock()
+_pending_stats = {'hits': 0, 'misses': 0}
+
+
+def get_cache():
+    return caches[CACHE_ALIAS]
+
+
+def _model_key(model):
+    return model._meta.label_lower
+
+
+def get_versions(models):
+    """Current version of each model, in one query. A missing version starts at a timestamp so it never reuses old keys."""
+    from .models import CacheVersion
+    names = [_model_key(model) for model in models]
+    versions = dict(CacheVersion.objects.filter(name__in=names).values_list('name', 'value'))
+    missing = [name for name in names if name not in versions]
+    if missing:
+        CacheVersion.objects.bulk_create(
+            [CacheVersion(name=name, value=time.time_ns()) for name in missing], ignore_conflicts=True,
+        )
+        versions.update(CacheVersion.objects.filter(name__in=missing).values_list('name', 'value'))
+    return [versions[name] for name in names]
+
+
+def bump_version(model):
+    def bump():
+        from .models import CacheVersion
+        name = _model_key(model)
+        # Atomic in the database, so concurrent bumps from several workers never collapse into one.
+        if not CacheVersion.objects.filter(name=name).update(value=F('value') + 1):
+            CacheVersion.objects.get_or_create(name=name, defaults={'value': time.time_ns()})
+
+    # Bumping before commit would let a concurrent reader cache pre-commit data under the new version.
+    transaction.on_commit(bump)
+
+
+def record(event):
+    flush_every = getattr(settings, 'CATALOG_CACHE_STATS_FLUSH', 50)
+    with _stats_lock:
+        _pending_stats[event] += 1
+        if sum(_pending_stats.values()) < flush_every:
+            return
+        pending = dict(_pending_stats)
+        _pending_stats.update(hits=0, misses=0)
+    _flush_stats(pending)
+
+
+def _flush_stats(pending):
+    cache = get_cache()
+    for event, count in pending.items():
+        if not count:
+            continue
+        key = STATS_KEY.format(event)
+        if not cache.add(key, count, timeout=None):
+            try:
+                cache.incr(key, count)
+            except ValueError:
+                cache.set(key, count, timeout=None)
+
+
+def get_stats():
+    """Hit/miss counters shared by every worker, plus this worker's not yet flushed events."""
+    cache = get_cache()
+    with _stats_lock:
+        pending = dict(_pending_stats)
+    hits = (cache.get(STATS_KEY.format('hits')) or 0) + pending['hits']
+    misses = (cache.get(STATS_KEY.format('misses')) or 0) + pending['misses']
+    total = hits + misses
+    return {
+        'backend': settings.CACHES[CACHE_ALIAS]['BACKEND'].rsplit('.', 1)[-1],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': round(hits / total * 100, 2) if total else 0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _pending_stats.update(hits=0, misses=0)
+    get_cache().delete_many([STATS_KEY.format('hits'), STATS_KEY.format('misses')])
+
+
+class CachedResponseMixin:
+    """Cache list/retrieve payloads keyed by normalized query params and the versions of `cache_models`.
+
+    Writes to any of `cache_models` bump its version (see the signals in models.py), which
+    orphans every stale entry at once; they then age out through `CATALOG_CACHE_TIMEOUT`.
+    """
+
+    cache_models = ()
+    # Query params whose requests always skip the cache (answered from state the versions don't cover).
+    uncached_params = ()
+
+    def cache_key(self, request):
+        params = sorted((key, value) for key in request.query_params for value in request.query_params.getlist(key))
+        versions = get_versions(self.cache_models)
+        raw = repr((
+            request.build_absolute_uri('/'),
+            self.basename,
+            self.action,
+            self.kwargs.get(self.lookup_url_kwarg or self.lookup_field),
+            params,
+            versions,
+        ))
+        return 'catalog:entry:' + hashlib.sha1(raw.encode('utf-8')).hexdigest()
+
+    def cache_entry(self, request):
+        """(key, entry) for this request, looked up once per view; key is None when it skips the cache.
+
+        An entry holds the serialized `data` and, for ConditionalGetMixin, its `validators`.
+        """
+        if not hasattr(self, '_cache_entry'):
+            if any(request.query_params.get(param) for param in self.uncached_params):
+                self._cache_entry = None, None
+            else:
+                key = self.cache_key(request)
+                self._cache_entry = key, get_cache().get(key)
+        return self._cache_entry
+
+    def store_entry(self, key, **values):
+        _, entry = self._cache_entry
+        entry = {**(entry or {}), **values}
+        self._cache_entry = key, entry
+        get_cache().set(key, entry, getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300))
+
+    def cached_response(self, request, build):
+        key, entry = self.cache_entry(request)
+        if key is None:
+            return build()
+        if entry and entry.get('data') is not None:
+            record('hits')
+            return Response(entry['data'])
+
+        record('misses')
+        response = build()
+        if response.status_code == 200:
+            self.store_entry(key, data=response.data)
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.cached_response(request, lambda: super(CachedResponseMixin, self).retrieve(request, *args, **kwargs))
+
+
+class ConditionalGetMixin:
+    """Strong ETag / Last-Modified on list and retrieve, answering 304 before anything is serialized.
+
+    Validators come from one aggregate over the filtered queryset: the newest of
+    `etag_timestamp_fields` plus the row count (lists), or that row's timestamps (detail).
+    Combined with CachedResponseMixin they are stored in the same versioned entry as the
+    payload, so the aggregate only runs on a cache miss.
+    """
+
+    etag_timestamp_fields = ('updated_at',)
+
+    def list_validators(self):
+        queryset = self.filter_queryset(self.get_queryset()).order_by()
+        aggregates = {f'max_{i}': Max(field) for i, field in enumerate(self.etag_timestamp_fields)}
+        values = queryset.aggregate(rows=Count('pk'), **aggregates)
+        timestamps = [values[f'max_{i}'] for i in range(len(self.etag_timestamp_fields))]
+        return [values['rows'], *timestamps], timestamps
+
+    def detail_validators(self):
+        lookup = self.lookup_url_kwarg or self.lookup_field
+        try:
+            row = (
+                self.get_queryset().order_by()
+                .filter(**{self.lookup_field: self.kwargs[lookup]})
+                .values_list(*self.etag_timestamp_fields)
+                .first()
+            )
+        except (TypeError, ValueError, ValidationError):
+            # Malformed id: no validators, so retrieve() answers its usual 404.
+            row = None
+        if row is None:
+            return None, None
+        return list(row), list(row)
+
+    def resolve_validators(self, request, validators):
+        if not isinstance(self, CachedResponseMixin):
+            return validators()
+        key, entry = self.cache_entry(request)
+        if entry and 'validators' in entry:
+            return entry['validators']
+        state, timestamps = validators()
+        if key is not None and state is not None:
+            self.store_entry(key, validators=(state, timestamps))
+        return state, timestamps
+
+    def conditional_response(self, request, validators, build):
+        state, timestamps = self.resolve_validators(request, validators)
+        if state is None:
+            return build()
+
+        raw = repr((
+            request.path,
+            sorted((key, value) for key, value in request.query_params.lists()),
+            request.accepted_media_type,
+            [value.isoformat() if hasattr(value, 'isoformat') else value for value in state],
+        ))
+        etag = '"%s"' % hashlib.sha1(raw.encode('utf-8')).hexdigest()
+        known = [value for value in timestamps if value is not None]
+        last_modified = max(known) if known else None
+
+        if_none_match = request.headers.get('If-None-Match')
+        if if_none_match:
+            candidates = [candidate.removeprefix('W/') for candidate in parse_etags(if_none_match)]
+            not_modified = etag in candidates or if_none_match.strip() == '*'
+        else:
+            since = parse_http_date_safe(request.headers.get('If-Modified-Since') or '')
+            not_modified = bool(since and last_modified and int(last_modified.timestamp()) <= since)
+
+        response = Response(status=status.HTTP_304_NOT_MODIFIED) if not_modified else build()
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+            response['Cache-Control'] = 'no-cache'
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.list_validators, lambda: super(ConditionalGetMixin, self).list(request, *args, **kwargs)
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional_response(
+            request, self.detail_validators, lambda: super(ConditionalGetMixin, self).retrieve(request, *args, **kwargs)
+        )
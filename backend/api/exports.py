@@ -0,0 +1,221 @@
+import csv
+import json
+import zlib
+from datetime import datetime, time, timedelta
+
+from django.db.models import Q, prefetch_related_objects
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Order, Repuesto
+
+EXPORT_FORMATS = ('csv', 'ndjson')
+COLUMNS = (
+    'id', 'sku', 'name', 'brand', 'model', 'year', 'description', 'price', 'stock',
+    'category_id', 'category_name', 'category_slug', 'image', 'images',
+    'rating_avg', 'rating_count', 'created_at', 'updated_at',
+)
+ORDER_FIELDS = (
+    'order_id', 'created_at', 'status', 'user_id', 'username', 'email',
+    'subtotal', 'coupon_code', 'discount_amount', 'total',
+    'phone', 'dni', 'address_line1', 'address_line2', 'city', 'province', 'postal_code', 'country',
+)
+ORDER_ITEM_FIELDS = ('repuesto_id', 'sku', 'name', 'brand', 'model', 'year', 'price', 'qty', 'line_total')
+# One CSV row per item, repeating the order columns; orders without items get a single row with empty item columns.
+ORDER_COLUMNS = ORDER_FIELDS + tuple(f'item_{field}' for field in ORDER_ITEM_FIELDS)
+
+
+def parse_updated_since(value):
+    """ISO date or datetime -> aware datetime; None for empty input. Raises ValueError if unparseable."""
+    value = (value or '').strip()
+    if not value:
+        return None
+    parsed = parse_datetime(value)
+    if parsed is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(value)
+        parsed = datetime.combine(day, time.min)
+    if timezone.is_naive(parsed):
+        parsed = timezone.make_aware(parsed)
+    return parsed
+
+
+def parse_date_until(value):
+    """Exclusive upper bound: a bare date covers that whole day, a datetime is used as is."""
+    until = parse_updated_since(value)
+    if until is not None and parse_datetime(value.strip()) is None:
+        until += timedelta(days=1)
+    return until
+
+
+def export_queryset(updated_since=None):
+    queryset = Repuesto.objects.select_related('category').prefetch_related('imagenes').order_by('id')
+    if updated_since:
+        queryset = queryset.filter(updated_at__gte=updated_since)
+    return queryset
+
+
+def iter_rows(queryset, absolute_url=None, chunk_size=1000):
+    """Yield one dict per Repuesto; the queryset is read (and images prefetched) `chunk_size` rows at a time."""
+    absolute_url = absolute_url or (lambda url: url)
+    for repuesto in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': repuesto.pk,
+            'sku': repuesto.sku or '',
+            'name': repuesto.name,
+            'brand': repuesto.brand,
+            'model': repuesto.model,
+            'year': repuesto.year,
+            'description': repuesto.description,
+            'price': str(repuesto.price),
+            'stock': repuesto.stock,
+            'category_id': repuesto.category_id,
+            'category_name': repuesto.category.name,
+            'category_slug': repuesto.category.slug,
+            'image': absolute_url(repuesto.image.url) if repuesto.image else '',
+            'images': [absolute_url(imagen.image.url) for imagen in repuesto.imagenes.all() if imagen.image],
+            'rating_avg': repuesto.rating_avg,
+            'rating_count': repuesto.rating_count,
+            'created_at': repuesto.created_at.isoformat(),
+            'updated_at': repuesto.updated_at.isoformat(),
+        }
+
+
+class _Echo:
+    """File-like object whose write() hands the line back to csv.writer's caller."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(COLUMNS)
+    for row in rows:
+        row['images'] = ' '.join(row['images'])
+        yield writer.writerow([row[column] for column in COLUMNS])
+
+
+def ndjson_lines(rows):
+    for row in rows:
+        yield json.dumps(row, ensure_ascii=False) + '\n'
+
+
+def encode(lines, compress=False, buffer_size=64 * 1024):
+    """UTF-8 encode, batch into ~`buffer_size` chunks and optionally gzip on the fly."""
+    compressor = zlib.compressobj(6, zlib.DEFLATED, 16 + zlib.MAX_WBITS) if compress else None
+    buffer = []
+    size = 0
+    for line in lines:
+        data = line.encode('utf-8')
+        buffer.append(data)
+        size += len(data)
+        if size >= buffer_size:
+            chunk = b''.join(buffer)
+            buffer, size = [], 0
+            chunk = compressor.compress(chunk) if compressor else chunk
+            if chunk:
+                yield chunk
+    chunk = b''.join(buffer)
+    if compressor:
+        chunk = compressor.compress(chunk) + compressor.flush()
+    if chunk:
+        yield chunk
+
+
+def export_catalog(export_format, updated_since=None, compress=False, absolute_url=None, chunk_size=1000):
+    """Byte chunks of the whole catalog (or rows updated since `updated_since`) as CSV or NDJSON."""
+    rows = iter_rows(export_queryset(updated_since), absolute_url, chunk_size)
+    lines = csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    return encode(lines, compress)
+
+
+def order_export_queryset(created_from=None, created_until=None, statuses=None):
+    queryset = Order.objects.all()
+    if created_from:
+        queryset = queryset.filter(created_at__gte=created_from)
+    if created_until:
+        queryset = queryset.filter(created_at__lt=created_until)
+    if statuses:
+        queryset = queryset.filter(status__in=statuses)
+    return queryset
+
+
+def iter_order_chunks(queryset, chunk_size=1000):
+    """Lists of up to `chunk_size` Orders in (created_at, id) order.
+
+    Each chunk is a keyset page on `order_created_idx` (no OFFSET, so the last page
+    costs the same as the first) plus one prefetch query for its items; only one
+    chunk is held in memory at a time.
+    """
+    queryset = queryset.select_related('user').order_by('created_at', 'id')
+    last = None
+    while True:
+        page = queryset
+        if last is not None:
+            page = page.filter(Q(created_at__gt=last.created_at) | Q(created_at=last.created_at, id__gt=last.pk))
+        orders = list(page[:chunk_size])
+        if not orders:
+            return
+        prefetch_related_objects(orders, 'items')
+        yield orders
+        last = orders[-1]
+
+
+def iter_order_rows(queryset, chunk_size=1000):
+    """Yield one dict per Order with its shipping snapshot, coupon and `items` list."""
+    for orders in iter_order_chunks(queryset, chunk_size):
+        for order in orders:
+            items = [
+                {
+                    'repuesto_id': item.repuesto_id,
+                    'sku': item.sku or '',
+                    'name': item.name,
+                    'brand': item.brand,
+                    'model': item.model,
+                    'year': item.year,
+                    'price': str(item.price),
+                    'qty': item.qty,
+                    'line_total': str(item.price * item.qty),
+                }
+                for item in order.items.all()
+            ]
+            yield {
+                'order_id': order.pk,
+                'created_at': order.created_at.isoformat(),
+                'status': order.status,
+                'user_id': order.user_id,
+                'username': order.user.username,
+                'email': order.user.email,
+                'subtotal': str(order.total + order.discount_amount),
+                'coupon_code': order.coupon_code or '',
+                'discount_amount': str(order.discount_amount),
+                'total': str(order.total),
+                'phone': order.phone,
+                'dni': order.dni,
+                'address_line1': order.address_line1,
+                'address_line2': order.address_line2,
+                'city': order.city,
+                'province': order.province,
+                'postal_code': order.postal_code,
+                'country': order.country,
+                'items': items,
+            }
+
+
+def order_csv_lines(rows):
+    writer = csv.writer(_Echo())
+    yield writer.writerow(ORDER_COLUMNS)
+    empty_item = dict.fromkeys(ORDER_ITEM_FIELDS, '')
+    for row in rows:
+        head = [row[field] for field in ORDER_FIELDS]
+        for item in row['items'] or [empty_item]:
+            yield writer.writerow(head + [item[field] for field in ORDER_ITEM_FIELDS])
+
+
+def export_orders(export_format, created_from=None, created_until=None, statuses=None, compress=False, chunk_size=1000):
+    """Byte chunks of every Order in the range (oldest first) with its items, as CSV or NDJSON."""
+    rows = iter_order_rows(order_export_queryset(created_from, created_until, statuses), chunk_size)
+    lines = order_csv_lines(rows) if export_format == 'csv' else ndjson_lines(rows)
+    return encode(lines, compress)
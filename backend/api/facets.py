@@ -0,0 +1,139 @@
+import threading
+from bisect import bisect_right
+from collections import Counter
+
+from django.conf import settings
+from django.db import transaction
+
+from . import caching
+
+FACETS = ('category', 'brand', 'model', 'year', 'price')
+DEFAULT_PRICE_BUCKETS = (50, 100, 250, 500, 1000)
+
+
+def price_buckets():
+    return tuple(getattr(settings, 'FACET_PRICE_BUCKETS', DEFAULT_PRICE_BUCKETS))
+
+
+def facet_row(repuesto):
+    """The facet values of one Repuesto, in FACETS order."""
+    return (
+        repuesto.category_id,
+        (repuesto.brand or '').strip(),
+        (repuesto.model or '').strip(),
+        repuesto.year,
+        bisect_right(price_buckets(), float(repuesto.price)),
+    )
+
+
+class FacetIndex:
+    """Per-process map of Repuesto id -> facet values, plus the global count of every value.
+
+    Saves made by this process are applied incrementally once they commit. A change made
+    by another worker shows up as an unexpected jump in the shared Repuesto version and
+    marks the index stale; it is then rebuilt on the next read.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.rows = {}
+        self.counts = {facet: Counter() for facet in FACETS}
+        self.version = None
+
+    def _shared_version(self):
+        from .models import Repuesto
+        return caching.get_versions([Repuesto])[0]
+
+    def rebuild(self):
+        from .models import Repuesto
+        version = self._shared_version()
+        rows = {}
+        counts = {facet: Counter() for facet in FACETS}
+        fields = ('id', 'category_id', 'brand', 'model', 'year', 'price')
+        for repuesto in Repuesto.objects.only(*fields).iterator(chunk_size=2000):
+            row = facet_row(repuesto)
+            rows[repuesto.pk] = row
+            for facet, value in zip(FACETS, row):
+                counts[facet][value] += 1
+        with self._lock:
+            self.rows, self.counts, self.version = rows, counts, version
+
+    def ensure_fresh(self):
+        if self.version is None or self.version != self._shared_version():
+            self.rebuild()
+
+    def _apply(self, pk, row):
+        old = self.rows.pop(pk, None)
+        if old is not None:
+            for facet, value in zip(FACETS, old):
+                self.counts[facet][value] -= 1
+                if not self.counts[facet][value]:
+                    del self.counts[facet][value]
+        if row is not None:
+            self.rows[pk] = row
+            for facet, value in zip(FACETS, row):
+                self.counts[facet][value] += 1
+
+    def stage(self, pk, row):
+        """Apply a change after commit. Runs after the Repuesto version bump queued by the same save."""
+        self.stage_many({pk: row})
+
+    def stage_many(self, rows):
+        """Apply {pk: row} changes made under a single version bump; `{}` acknowledges a bump that changed no facet."""
+        def apply():
+            with self._lock:
+                if self.version is None:
+                    return
+                shared = self._shared_version()
+                if shared == self.version + 1:
+                    for pk, row in rows.items():
+                        self._apply(pk, row)
+                    self.version = shared
+                else:
+                    self.version = None
+        transaction.on_commit(apply)
+
+    def counts_for(self, ids=None):
+        """Facet counts over `ids`, or over the whole catalog when `ids` is None."""
+        self.ensure_fresh()
+        with self._lock:
+            if ids is None:
+                return len(self.rows), {facet: Counter(self.counts[facet]) for facet in FACETS}
+            counts = {facet: Counter() for facet in FACETS}
+            total = 0
+            for pk in ids:
+                row = self.rows.get(pk)
+                if row is None:
+                    continue
+                total += 1
+                for facet, value in zip(FACETS, row):
+                    counts[facet][value] += 1
+        return total, counts
+
+
+facet_index = FacetIndex()
+
+
+def serialize_facets(total, counts, categories):
+    """Shape raw counters for the API. `categories` maps id -> Categoria."""
+    buckets = price_buckets()
+    edges = (0, *buckets, None)
+    category_facet = []
+    for category_id, count in counts['category'].most_common():
+        category = categories.get(category_id)
+        if category is not None:
+            category_facet.append({'id': category.id, 'name': category.name, 'slug': category.slug, 'count': count})
+    return {
+        'count': total,
+        'category': category_facet,
+        'brand': [{'value': value, 'count': count} for value, count in counts['brand'].most_common() if value],
+        'model': [{'value': value, 'count': count} for value, count in counts['model'].most_common() if value],
+        'year': [
+            {'value': value, 'count': count}
+            for value, count in sorted(((v, c) for v, c in counts['year'].items() if v is not None), reverse=True)
+        ],
+        'price': [
+            {'min': edges[index], 'max': edges[index + 1], 'count': counts['price'].get(index, 0)}
+            for index in range(len(buckets) + 1)
+        ],
+    }
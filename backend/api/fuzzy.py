@@ -0,0 +1,180 @@
+import logging
+import re
+import threading
+from array import array
+from collections import Counter
+from math import ceil
+
+from django.conf import settings
+from django.db import connection
+
+from . import caching
+from .search import fold_text
+
+logger = logging.getLogger(__name__)
+
+_NON_ALNUM_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def words(value):
+    return _NON_ALNUM_RE.sub(' ', fold_text(value)).split()
+
+
+def padded_text(value):
+    """Each word padded like pg_trgm ("  word "), so `trigram in text` is exact set membership."""
+    return ''.join(f'  {word} ' for word in words(value))
+
+
+def text_trigrams(text):
+    grams = set()
+    for word in text.split():
+        padded = f'  {word} '
+        grams.update(padded[i:i + 3] for i in range(len(padded) - 2))
+    return grams
+
+
+def trigrams(value):
+    return text_trigrams(padded_text(value))
+
+
+class TrigramIndex:
+    """In-memory inverted index from trigrams to normalized names and SKUs.
+
+    Each Repuesto contributes its name, its SKU and its SKU without punctuation, so
+    "BRKTCOR1802" and "brk-tcor18-02" both land near "BRK-TCOR18-01". Lookups scan the
+    rarest trigrams first and stop after `FUZZY_SEARCH_MAX_POSTINGS` ids, which bounds the
+    cost of a query regardless of catalog size. When the shared Repuesto version moves the
+    index is rebuilt in a background thread and the previous one keeps answering meanwhile.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self.postings = {}
+        self.texts = []
+        self.sizes = array('H')
+        self.owners = array('L')
+        self.version = None
+        self.pending = False
+
+    def _shared_version(self):
+        from .models import Repuesto
+        return caching.get_versions([Repuesto])[0]
+
+    def build(self, rows):
+        """Build the index structures from (pk, name, sku) tuples."""
+        max_entries = getattr(settings, 'FUZZY_SEARCH_MAX_ENTRIES', 300000)
+        postings = {}
+        texts = []
+        sizes = array('H')
+        owners = array('L')
+        for pk, name, sku in rows:
+            if len(texts) >= max_entries:
+                break
+            sku_words = words(sku)
+            candidates = [words(name), sku_words]
+            if len(sku_words) > 1:
+                candidates.append([''.join(sku_words)])
+            seen = set()
+            for entry_words in candidates:
+                text = ''.join(f'  {word} ' for word in entry_words)
+                if not text or text in seen:
+                    continue
+                seen.add(text)
+                ref = len(texts)
+                grams = text_trigrams(text)
+                for gram in grams:
+                    postings.setdefault(gram, []).append(ref)
+                texts.append(text)
+                sizes.append(min(len(grams), 0xFFFF))
+                owners.append(pk)
+        return {gram: array('L', refs) for gram, refs in postings.items()}, texts, sizes, owners
+
+    def rebuild(self):
+        from .models import Repuesto
+        version = self._shared_version()
+        queryset = Repuesto.objects.order_by('id').values_list('id', 'name', 'sku')
+        postings, texts, sizes, owners = self.build(queryset.iterator(chunk_size=2000))
+        with self._lock:
+            self.postings, self.texts, self.sizes, self.owners = postings, texts, sizes, owners
+            self.version = version
+
+    def _rebuild_in_background(self):
+        try:
+            with self._rebuild_lock:
+                self.rebuild()
+        except Exception:
+            logger.exception('No se pudo reconstruir el índice de trigramas')
+        finally:
+            self.pending = False
+            connection.close()
+
+    def ensure_fresh(self):
+        if self.version is None:
+            with self._rebuild_lock:
+                if self.version is None:
+                    self.rebuild()
+            return
+        if self.pending or self.version == self._shared_version():
+            return
+        with self._lock:
+            if self.pending:
+                return
+            self.pending = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def search(self, query, limit=50):
+        """Repuesto ids whose name or SKU resembles `query`, most similar first.
+
+        A hit must share at least `FUZZY_SEARCH_THRESHOLD` of the query's trigrams; ties
+        go to the shorter string (higher Jaccard similarity).
+        """
+        grams = trigrams(query)
+        if not grams:
+            return []
+        self.ensure_fresh()
+        with self._lock:
+            postings, texts, sizes, owners = self.postings, self.texts, self.sizes, self.owners
+
+        threshold = getattr(settings, 'FUZZY_SEARCH_THRESHOLD', 0.5)
+        budget = getattr(settings, 'FUZZY_SEARCH_MAX_POSTINGS', 20000)
+        max_candidates = getattr(settings, 'FUZZY_SEARCH_MAX_CANDIDATES', 1000)
+        needed = max(1, ceil(threshold * len(grams)))
+        ordered = sorted(grams, key=lambda gram: len(postings.get(gram, ())))
+
+        # Postings are counted rarest first while the budget lasts; trigrams past it are
+        # checked against the text of the best candidates only.
+        counts = Counter()
+        unscanned = []
+        scanned = 0
+        for gram in ordered:
+            refs = postings.get(gram)
+            if not refs:
+                continue
+            if scanned + len(refs) <= budget:
+                counts.update(refs)
+            else:
+                if not counts:
+                    # Even the rarest trigram is too common: sample candidates from it.
+                    counts.update(dict.fromkeys(refs[:budget], 0))
+                unscanned.append(gram)
+            scanned += len(refs)
+
+        best = {}
+        for ref, shared in counts.most_common(max_candidates):
+            if shared + len(unscanned) < needed:
+                continue
+            if unscanned:
+                text = texts[ref]
+                shared += sum(gram in text for gram in unscanned)
+                if shared < needed:
+                    continue
+            score = (shared / len(grams), shared / (len(grams) + sizes[ref] - shared))
+            pk = owners[ref]
+            if score > best.get(pk, (0, 0)):
+                best[pk] = score
+        ranked = sorted(best, key=lambda pk: (best[pk][0], best[pk][1], -pk), reverse=True)
+        return ranked[:limit]
+
+
+trigram_index = TrigramIndex()
@@ -0,0 +1,115 @@
+import hashlib
+import json
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db import IntegrityError, transaction
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import IdempotencyKey
+
+HEADER = 'Idempotency-Key'
+MAX_KEY_LENGTH = 255
+
+
+def key_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_KEY_TTL', 24 * 3600))
+
+
+def lease_ttl():
+    return timedelta(seconds=getattr(settings, 'IDEMPOTENCY_LEASE_TTL', 120))
+
+
+def fingerprint(request):
+    """sha256 of the request body, so a key reused with a different payload is detected."""
+    body = json.dumps(request.data, sort_keys=True, cls=DjangoJSONEncoder)
+    return hashlib.sha256(f'{request.method} {request.path}\n{body}'.encode('utf-8')).hexdigest()
+
+
+def claim(user, scope, key, digest):
+    """(record, claimed): insert the key row, or return the existing live one.
+
+    The unique constraint is the lock: a concurrent duplicate fails its INSERT right
+    away instead of waiting on the first request. An expired row is replaced; in-flight
+    rows only hold a short lease, so one left behind by a killed worker is taken over
+    by the next retry instead of answering 409 until the full TTL.
+    """
+    now = timezone.now()
+    for _ in range(2):
+        try:
+            with transaction.atomic():
+                record = IdempotencyKey.objects.create(
+                    user=user, scope=scope, key=key, fingerprint=digest, expires_at=now + lease_ttl(),
+                )
+            return record, True
+        except IntegrityError:
+            pass
+        record = IdempotencyKey.objects.filter(user=user, scope=scope, key=key).first()
+        if record is not None and record.expires_at > now:
+            return record, False
+        IdempotencyKey.objects.filter(user=user, scope=scope, key=key, expires_at__lte=now).delete()
+    return record, False
+
+
+def purge_expired():
+    deleted, _ = IdempotencyKey.objects.filter(expires_at__lte=timezone.now()).delete()
+    return deleted
+
+
+class IdempotentCreateMixin:
+    """Honour an `Idempotency-Key` header on create.
+
+    The first request with a key runs normally and its successful response is stored;
+    repeating the key (same user, same body) replays that response without running
+    validation or side effects again. While the first request is still in flight a
+    duplicate gets 409. Failed creates release the key so the client can retry.
+    """
+
+    idempotency_scope = None
+
+    def create(self, request, *args, **kwargs):
+        key = request.headers.get(HEADER, '').strip()
+        if not key:
+            return super().create(request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            return Response(
+                {'detail': f'{HEADER} admite hasta {MAX_KEY_LENGTH} caracteres.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+
+        digest = fingerprint(request)
+        record, claimed = claim(request.user, self.idempotency_scope or self.basename, key, digest)
+        if not claimed:
+            return self.idempotent_replay(record, digest)
+
+        try:
+            with transaction.atomic():
+                response = super().create(request, *args, **kwargs)
+                if status.is_success(response.status_code):
+                    record.status_code = response.status_code
+                    record.response = response.data
+                    record.expires_at = timezone.now() + key_ttl()
+                    # Fails if a retry already took over the expired lease, rolling this create back.
+                    record.save(update_fields=['status_code', 'response', 'expires_at'])
+                    return response
+        except Exception:
+            record.delete()
+            raise
+        record.delete()
+        return response
+
+    def idempotent_replay(self, record, digest):
+        if record is not None and record.fingerprint != digest:
+            return Response(
+                {'detail': f'{HEADER} ya usada con otra solicitud.'},
+                status=status.HTTP_422_UNPROCESSABLE_ENTITY,
+            )
+        if record is None or record.status_code is None:
+            return Response(
+                {'detail': 'Hay una solicitud con la misma Idempotency-Key en curso. Reintenta en unos segundos.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        return Response(record.response, status=record.status_code, headers={'Idempotent-Replayed': 'true'})
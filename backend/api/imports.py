@@ -0,0 +1,344 @@
+import csv
+import gzip
+import json
+import sys
+from collections import Counter
+from decimal import Decimal, InvalidOperation
+
+from django.db import transaction
+from django.db.models import DecimalField, PositiveIntegerField
+from django.utils import timezone
+from django.utils.text import slugify
+
+from . import search
+from .caching import bump_version
+from .models import Categoria, Fitment, Repuesto, case_by_pk, notify_stock_alerts, refresh_category_stats, stock_alert, sync_primary_fitments
+
+IMPORT_FORMATS = ('csv', 'ndjson')
+TEXT_FIELDS = ('name', 'brand', 'model', 'description')
+REQUIRED_ON_CREATE = ('name', 'price', 'category_id')
+FITMENT_FIELDS = {'brand', 'model', 'year'}
+CATEGORY_STATS_FIELDS = {'category_id', 'price', 'stock'}
+
+
+class ImportRowError(ValueError):
+    pass
+
+
+def open_source(path):
+    """Text stream for `path` ("-" is stdin, *.gz is decompressed on the fly)."""
+    if path == '-':
+        return sys.stdin
+    if path.endswith('.gz'):
+        return gzip.open(path, 'rt', encoding='utf-8', newline='')
+    return open(path, encoding='utf-8', newline='')
+
+
+def detect_format(path):
+    name = path[:-3] if path.endswith('.gz') else path
+    return 'ndjson' if name.endswith(('.ndjson', '.jsonl')) else 'csv'
+
+
+def read_rows(stream, import_format):
+    """Yield (line number, dict or None) without loading the file; None marks an unparseable NDJSON line."""
+    if import_format == 'csv':
+        reader = csv.DictReader(stream)
+        for row in reader:
+            yield reader.line_num, row
+        return
+    for number, line in enumerate(stream, 1):
+        if not line.strip():
+            continue
+        try:
+            row = json.loads(line)
+        except ValueError:
+            row = None
+        yield number, row if isinstance(row, dict) else None
+
+
+def parse_price(value):
+    """Non-negative price rounded to cents; NaN, Infinity and garbage raise ImportRowError."""
+    try:
+        price = Decimal(str(value).strip())
+        if not price.is_finite():
+            raise InvalidOperation
+        price = price.quantize(Decimal('0.01'))
+        negative = price < 0
+    except InvalidOperation:
+        raise ImportRowError(f'Precio inválido: {value}')
+    if negative:
+        raise ImportRowError('El precio no puede ser negativo.')
+    return price
+
+
+class CatalogImporter:
+    """Upsert Repuestos by SKU in batches with bulk_create / bulk_update.
+
+    Bulk writes skip the model signals, so their work is done here once per batch
+    (search index, primary fitments) or once per import (stock notifications, category
+    counters, cache versions). Only the columns present in a row are updated.
+    """
+
+    def __init__(self, batch_size=1000, dry_run=False, create_categories=False):
+        self.batch_size = batch_size
+        self.dry_run = dry_run
+        self.create_categories = create_categories
+        self.stats = Counter()
+        self.errors = []
+        self.alerts = []
+        self.seen_skus = set()
+        self.touched_categories = set()
+        self.categories = {}
+        for categoria in Categoria.objects.all():
+            self._remember(categoria)
+
+    def _remember(self, categoria):
+        self.categories[('id', str(categoria.pk))] = categoria.pk
+        self.categories[('slug', categoria.slug)] = categoria.pk
+        self.categories[('name', categoria.name.strip().lower())] = categoria.pk
+
+    def error(self, line, message):
+        self.stats['errors'] += 1
+        if len(self.errors) < 50:
+            self.errors.append((line, message))
+
+    def resolve_category(self, row):
+        for key, kind in (('category_slug', 'slug'), ('category_name', 'name'), ('category_id', 'id'), ('category', 'name')):
+            value = str(row.get(key) or '').strip()
+            if not value:
+                continue
+            lookup = value.lower() if kind == 'name' else value
+            if (kind, lookup) in self.categories:
+                return self.categories[(kind, lookup)]
+            if kind == 'name' and self.create_categories:
+                if self.dry_run:
+                    # Would be created; any id works since nothing is written.
+                    self.categories[(kind, lookup)] = 0
+                    return 0
+                categoria = Categoria.objects.create(name=value, slug=slugify(value))
+                self._remember(categoria)
+                return categoria.pk
+            raise ImportRowError(f'Categoría desconocida: {value}')
+        return None
+
+    def clean(self, row):
+        """Row -> (sku, {field: value}) with only the fields the row provides."""
+        sku = str(row.get('sku') or '').strip()
+        if not sku:
+            raise ImportRowError('Falta el SKU.')
+        data = {}
+        for field in TEXT_FIELDS:
+            if field in row and row[field] is not None:
+                data[field] = str(row[field]).strip()
+        if 'name' in data and not data['name']:
+            raise ImportRowError('El nombre no puede estar vacío.')
+        if str(row.get('price') or '').strip():
+            data['price'] = parse_price(row['price'])
+        for field in ('stock', 'year'):
+            value = str(row.get(field) if row.get(field) is not None else '').strip()
+            if not value:
+                # An empty year clears it; an empty stock keeps the current one.
+                if field == 'year' and field in row:
+                    data['year'] = None
+                continue
+            try:
+                data[field] = int(value)
+            except ValueError:
+                raise ImportRowError(f'{field} inválido: {value}')
+            if data[field] < 0:
+                raise ImportRowError(f'{field} no puede ser negativo.')
+        category_id = self.resolve_category(row)
+        if category_id is not None:
+            data['category_id'] = category_id
+        return sku, data
+
+    def run(self, rows, progress=None):
+        batch = {}
+        for line, row in rows:
+            self.stats['rows'] += 1
+            if row is None:
+                self.error(line, 'JSON inválido.')
+                continue
+            try:
+                sku, data = self.clean(row)
+            except ImportRowError as exc:
+                self.error(line, str(exc))
+                continue
+            batch[sku] = (line, data)
+            if len(batch) >= self.batch_size:
+                self.import_batch(batch)
+                batch = {}
+                if progress:
+                    progress(self.stats)
+        if batch:
+            self.import_batch(batch)
+        self.finish()
+        return self.stats
+
+    def import_batch(self, batch):
+        existing = {repuesto.sku: repuesto for repuesto in Repuesto.objects.filter(sku__in=list(batch))}
+        creates, updates = [], []
+        update_fields = set()
+        reindex, refit = [], []
+        for sku, (line, data) in batch.items():
+            repuesto = existing.get(sku)
+            if repuesto is None:
+                if self.dry_run and sku in self.seen_skus:
+                    self.stats['updated'] += 1
+                    continue
+                missing = [field for field in REQUIRED_ON_CREATE if field not in data]
+                if missing:
+                    self.error(line, f'Faltan campos para crear el repuesto: {", ".join(missing)}.')
+                    continue
+                repuesto = Repuesto(sku=sku, **data)
+                creates.append(repuesto)
+                self.touched_categories.add(repuesto.category_id)
+                reindex.append(repuesto)
+                refit.append(repuesto)
+                self.seen_skus.add(sku)
+                continue
+
+            changed = {field for field, value in data.items() if getattr(repuesto, field) != value}
+            if not changed:
+                self.stats['unchanged'] += 1
+                continue
+            if 'stock' in changed:
+                alert = stock_alert(data.get('name', repuesto.name), repuesto.stock, data['stock'])
+                if alert:
+                    self.alerts.append((repuesto.pk, *alert))
+            if changed & CATEGORY_STATS_FIELDS:
+                self.touched_categories.update((repuesto.category_id, data.get('category_id', repuesto.category_id)))
+            for field in changed:
+                setattr(repuesto, field, data[field])
+            updates.append(repuesto)
+            update_fields |= changed
+            if changed & set(search.FTS_COLUMNS):
+                reindex.append(repuesto)
+            if changed & FITMENT_FIELDS:
+                refit.append(repuesto)
+
+        self.stats['created'] += len(creates)
+        self.stats['updated'] += len(updates)
+        if self.dry_run:
+            return
+        now = timezone.now()
+        for repuesto in updates:
+            repuesto.updated_at = now
+        with transaction.atomic():
+            Repuesto.objects.bulk_create(creates, batch_size=500)
+            if updates:
+                Repuesto.objects.bulk_update(updates, sorted(update_fields | {'updated_at'}), batch_size=500)
+            search.index_repuestos(reindex)
+            if refit:
+                sync_primary_fitments(refit)
+                self.stats['fitments'] += len(refit)
+
+    def finish(self):
+        if self.dry_run:
+            return
+        self.stats['notifications'] = notify_stock_alerts(self.alerts)
+        refresh_category_stats(self.touched_categories)
+        if self.stats['created'] or self.stats['updated']:
+            bump_version(Repuesto)
+        if self.stats['fitments']:
+            bump_version(Fitment)
+
+
+def parse_feed_entry(entry):
+    """Validate one `{sku, price?, stock?, stock_delta?}` entry of a supplier feed."""
+    if not isinstance(entry, dict):
+        raise ImportRowError('Cada elemento debe ser un objeto.')
+    sku = str(entry.get('sku') or '').strip()
+    if not sku:
+        raise ImportRowError('Falta el SKU.')
+    data = {}
+    if entry.get('price') is not None:
+        data['price'] = parse_price(entry['price'])
+    for field in ('stock', 'stock_delta'):
+        if entry.get(field) is None:
+            continue
+        if isinstance(entry[field], bool) or not isinstance(entry[field], (int, str)):
+            raise ImportRowError(f'{field} debe ser un entero.')
+        try:
+            data[field] = int(entry[field])
+        except ValueError:
+            raise ImportRowError(f'{field} debe ser un entero.')
+    if 'stock' in data and 'stock_delta' in data:
+        raise ImportRowError('Usá stock o stock_delta, no ambos.')
+    if data.get('stock', 0) < 0:
+        raise ImportRowError('El stock no puede ser negativo.')
+    if not data:
+        raise ImportRowError('Indicá price, stock o stock_delta.')
+    return sku, data
+
+
+def apply_feed_updates(entries, chunk_size=500):
+    """Apply price/stock entries with set-based UPDATEs in one transaction; per-entry results in input order.
+
+    Rows are read once (locked where the database supports it) to resolve SKUs and
+    detect stock-threshold crossings; each chunk is then written with a single
+    UPDATE ... SET price = CASE ..., stock = CASE ..., where a stock_delta is applied
+    in SQL as stock + delta.
+    """
+    results = [None] * len(entries)
+    parsed = {}
+    for position, entry in enumerate(entries):
+        try:
+            sku, data = parse_feed_entry(entry)
+        except ImportRowError as exc:
+            results[position] = {'sku': entry.get('sku') if isinstance(entry, dict) else None, 'status': 'error', 'detail': str(exc)}
+            continue
+        if sku in parsed:
+            results[position] = {'sku': sku, 'status': 'error', 'detail': 'SKU repetido en la misma solicitud.'}
+            continue
+        parsed[sku] = (position, data)
+
+    alerts = []
+    with transaction.atomic():
+        current = {
+            row[1]: row
+            for row in Repuesto.objects.select_for_update()
+            .filter(sku__in=list(parsed)).values_list('id', 'sku', 'name', 'price', 'stock', 'category_id')
+        }
+        changes = []
+        categories = set()
+        for sku, (position, data) in parsed.items():
+            if sku not in current:
+                results[position] = {'sku': sku, 'status': 'not_found'}
+                continue
+            pk, _, name, price, stock, category_id = current[sku]
+            new_price = data.get('price', price)
+            new_stock = data['stock'] if 'stock' in data else stock + data.get('stock_delta', 0)
+            if new_stock < 0:
+                results[position] = {'sku': sku, 'status': 'error', 'detail': f'Stock insuficiente ({stock}).'}
+                continue
+            results[position] = {'sku': sku, 'status': 'updated', 'price': str(new_price), 'stock': new_stock}
+            if (new_price, new_stock) == (price, stock):
+                results[position]['status'] = 'unchanged'
+                continue
+            changes.append((pk, data))
+            categories.add(category_id)
+            alert = stock_alert(name, stock, new_stock)
+            if alert:
+                alerts.append((pk, *alert))
+
+        now = timezone.now()
+        for start in range(0, len(changes), chunk_size):
+            chunk = changes[start:start + chunk_size]
+            prices = [(pk, data['price'], False) for pk, data in chunk if 'price' in data]
+            stocks = [
+                (pk, data['stock'], False) if 'stock' in data else (pk, data['stock_delta'], True)
+                for pk, data in chunk if 'stock' in data or 'stock_delta' in data
+            ]
+            values = {'updated_at': now}
+            if prices:
+                values['price'] = case_by_pk('price', prices, DecimalField(max_digits=10, decimal_places=2))
+            if stocks:
+                values['stock'] = case_by_pk('stock', stocks, PositiveIntegerField())
+            Repuesto.objects.filter(pk__in=[pk for pk, _ in chunk]).update(**values)
+
+        notifications = notify_stock_alerts(alerts)
+        refresh_category_stats(categories)
+        if changes:
+            bump_version(Repuesto)
+    return results, notifications
@@ -0,0 +1,209 @@
+import json
+import logging
+import multiprocessing
+import os
+import random
+import socket
+import threading
+import time
+import traceback
+from collections import Counter
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, ThreadPoolExecutor, wait
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import close_old_connections, connection, connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+logger = logging.getLogger(__name__)
+
+# name -> (function, max_attempts or None); filled by @task in api/tasks.py, imported from ApiConfig.ready().
+TASKS = {}
+
+
+def task(name=None, max_attempts=None):
+    """Register a function as a background task. Its payload is passed as keyword arguments."""
+    def register(func):
+        TASKS[name or func.__name__] = (func, max_attempts)
+        return func
+    return register
+
+
+def enqueue(name, payload=None, delay=0, max_attempts=None):
+    """Queue `name(**payload)`. Inside a transaction the job commits (or rolls back) with it.
+
+    With JOBS_EAGER the task runs in-process right after commit instead, for setups
+    without a worker.
+    """
+    from .models import Job
+    if name not in TASKS:
+        raise LookupError(f'Tarea desconocida: {name}')
+    payload = json.loads(json.dumps(payload or {}, cls=Job._meta.get_field('payload').encoder))
+    if getattr(settings, 'JOBS_EAGER', False):
+        transaction.on_commit(lambda: TASKS[name][0](**payload))
+        return None
+    return Job.objects.create(
+        task=name,
+        payload=payload,
+        run_at=timezone.now() + timedelta(seconds=delay),
+        max_attempts=max_attempts or TASKS[name][1] or getattr(settings, 'JOBS_MAX_ATTEMPTS', 5),
+    )
+
+
+def claim(worker_id, limit):
+    """Lock up to `limit` due jobs for `worker_id` with a single UPDATE ... RETURNING.
+
+    Two workers can race for the same rows, but only one UPDATE sees them still
+    `queued`; PostgreSQL also skips rows another worker has locked. Needs RETURNING
+    support (SQLite 3.35+ or PostgreSQL).
+    """
+    from .models import Job
+    if limit <= 0:
+        return []
+    now = connection.ops.adapt_datetimefield_value(timezone.now())
+    table = connection.ops.quote_name(Job._meta.db_table)
+    skip_locked = ' FOR UPDATE SKIP LOCKED' if connection.features.has_select_for_update_skip_locked else ''
+    with transaction.atomic(), connection.cursor() as cursor:
+        cursor.execute(
+            f"UPDATE {table} SET status = 'running', locked_by = %s, locked_at = %s, attempts = attempts + 1 "
+            f"WHERE status = 'queued' AND id IN ("
+            f"SELECT id FROM {table} WHERE status = 'queued' AND run_at <= %s ORDER BY run_at, id LIMIT %s{skip_locked}"
+            f") RETURNING id, task, payload, attempts, max_attempts",
+            [worker_id, now, now, limit],
+        )
+        rows = cursor.fetchall()
+    return [
+        Job(
+            pk=pk, task=name, status='running', attempts=attempts, max_attempts=max_attempts,
+            payload=json.loads(payload) if isinstance(payload, (str, bytes)) else payload,
+        )
+        for pk, name, payload, attempts, max_attempts in sorted(rows)
+    ]
+
+
+def backoff(attempt):
+    """Seconds before retry number `attempt`: exponential from JOBS_BACKOFF_BASE, capped, with +-20% jitter."""
+    base = getattr(settings, 'JOBS_BACKOFF_BASE', 10)
+    cap = getattr(settings, 'JOBS_BACKOFF_MAX', 3600)
+    return min(cap, base * 2 ** (attempt - 1)) * random.uniform(0.8, 1.2)
+
+
+def run_job(job):
+    """Run one claimed job in its own transaction and record the outcome. True on success."""
+    from .models import Job
+    close_old_connections()
+    try:
+        func = TASKS.get(job.task, (None,))[0]
+        if func is None:
+            raise LookupError(f'Tarea desconocida: {job.task}')
+        with transaction.atomic():
+            func(**job.payload)
+    except Exception:
+        error = traceback.format_exc()
+        now = timezone.now()
+        if job.attempts >= job.max_attempts:
+            logger.error('Job %s (%s) movido a fallidos tras %s intentos', job.pk, job.task, job.attempts)
+            Job.objects.filter(pk=job.pk).update(status='dead', last_error=error, finished_at=now, locked_by='', locked_at=None)
+        else:
+            retry_at = now + timedelta(seconds=backoff(job.attempts))
+            Job.objects.filter(pk=job.pk).update(status='queued', last_error=error, run_at=retry_at, locked_by='', locked_at=None)
+        return False
+    Job.objects.filter(pk=job.pk).update(status='done', finished_at=timezone.now(), locked_by='', locked_at=None)
+    return True
+
+
+def release_stale(timeout):
+    """Requeue jobs whose worker died while running them (locked longer than `timeout` seconds)."""
+    from .models import Job
+    cutoff = timezone.now() - timedelta(seconds=timeout)
+    stale = Job.objects.filter(status='running', locked_at__lt=cutoff)
+    dead = stale.filter(attempts__gte=F('max_attempts')).update(
+        status='dead', last_error='Worker interrumpido.', finished_at=timezone.now(), locked_by='', locked_at=None,
+    )
+    return dead + stale.update(status='queued', locked_by='', locked_at=None)
+
+
+def purge_done(keep_days):
+    from .models import Job
+    cutoff = timezone.now() - timedelta(days=keep_days)
+    deleted, _ = Job.objects.filter(status='done', finished_at__lt=cutoff).delete()
+    return deleted
+
+
+def _noop():
+    return None
+
+
+class Worker:
+    """Claims due jobs and runs them on a thread or process pool until stopped.
+
+    Only as many jobs as there are free slots are claimed, so a slow task never keeps
+    others locked. Every `maintenance_interval` seconds stale locks are released and
+    old finished jobs purged.
+    """
+
+    maintenance_interval = 60
+
+    def __init__(self, concurrency=4, pool='thread', poll_interval=1.0):
+        self.concurrency = concurrency
+        self.pool = pool
+        self.poll_interval = poll_interval
+        self.worker_id = f'{socket.gethostname()}:{os.getpid()}'
+        self.stopping = threading.Event()
+        self.stats = Counter()
+
+    def stop(self):
+        self.stopping.set()
+
+    def make_executor(self):
+        if self.pool != 'process':
+            return ThreadPoolExecutor(self.concurrency, thread_name_prefix='job')
+        # Fork every child now, before this process opens a connection they could inherit.
+        connections.close_all()
+        executor = ProcessPoolExecutor(self.concurrency, mp_context=multiprocessing.get_context('fork'))
+        wait([executor.submit(_noop) for _ in range(self.concurrency)])
+        return executor
+
+    def maintenance(self):
+        release_stale(getattr(settings, 'JOBS_LOCK_TIMEOUT', 600))
+        purge_done(getattr(settings, 'JOBS_KEEP_DONE_DAYS', 7))
+
+    def run(self, once=False):
+        """Process jobs until stop() (or, with `once`, until the queue is empty). Returns the stats Counter."""
+        running = set()
+        next_maintenance = 0
+        with self.make_executor() as executor:
+            while not self.stopping.is_set():
+                if time.monotonic() >= next_maintenance:
+                    self.maintenance()
+                    next_maintenance = time.monotonic() + self.maintenance_interval
+                finished = {future for future in running if future.done()}
+                for future in finished:
+                    self.tally(future)
+                running -= finished
+
+                claimed = claim(self.worker_id, self.concurrency - len(running))
+                for job in claimed:
+                    running.add(executor.submit(run_job, job))
+                self.stats['claimed'] += len(claimed)
+                if claimed:
+                    continue
+                if once and not running:
+                    break
+                if running:
+                    wait(running, timeout=self.poll_interval, return_when=FIRST_COMPLETED)
+                else:
+                    self.stopping.wait(self.poll_interval)
+            for future in running:
+                self.tally(future)
+        return self.stats
+
+    def tally(self, future):
+        try:
+            succeeded = future.result()
+        except Exception:
+            # Could not even record the outcome; the lock times out and release_stale() requeues the job.
+            logger.exception('Error al registrar el resultado de un job')
+            succeeded = False
+        self.stats['done' if succeeded else 'failed'] += 1
@@ -0,0 +1,44 @@
+from django.core.management.base import BaseCommand
+from django.db.models import Max
+
+from api.models import CoPurchaseRun, OrderItem, Repuesto
+from api.recommendations import count_co_purchases, store_co_purchases
+
+
+class Command(BaseCommand):
+    help = 'Calcula los repuestos "comprados juntos" a partir del historial de órdenes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--full', action='store_true', help='Recalcula todo en lugar de solo las órdenes nuevas.')
+        parser.add_argument('--top-k', type=int, default=10, help='Vecinos guardados por repuesto.')
+        parser.add_argument('--batch-size', type=int, default=500, help='Repuestos procesados por pasada.')
+
+    def handle(self, *args, **options):
+        top_k = options['top_k']
+        batch_size = options['batch_size']
+        last_run = CoPurchaseRun.objects.order_by('-id').first()
+        full = options['full'] or last_run is None
+        since = 0 if full else last_run.last_order_id
+        # Orders committed after this point are left for the next run.
+        until = OrderItem.objects.aggregate(last=Max('order_id'))['last'] or 0
+
+        if full:
+            anchors = Repuesto.objects.order_by('id').values_list('id', flat=True)
+        else:
+            anchors = (
+                OrderItem.objects.filter(order_id__gt=since, order_id__lte=until, repuesto__isnull=False)
+                .order_by('repuesto_id').values_list('repuesto_id', flat=True).distinct()
+            )
+        # A pair count only changes when a new order holds both repuestos, so
+        # recomputing the repuestos of new orders keeps every stored row exact.
+        anchors = list(anchors)
+
+        rows = 0
+        for start in range(0, len(anchors), batch_size):
+            counts = count_co_purchases(anchors[start:start + batch_size])
+            rows += store_co_purchases(counts, top_k)
+
+        CoPurchaseRun.objects.create(last_order_id=until, repuestos_updated=len(anchors), full=full)
+        self.stdout.write(self.style.SUCCESS(
+            f'Recomendaciones actualizadas. Repuestos: {len(anchors)}, relaciones: {rows}, hasta la orden #{until}.'
+        ))
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from api.models import Repuesto
+from api.similar import build_vectors, document_terms, index_path, nearest_neighbours, write_index
+
+
+class Command(BaseCommand):
+    help = 'Calcula los repuestos similares (TF-IDF sobre nombre, descripción, vehículo y categoría).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--top-k', type=int, default=10, help='Similares guardados por repuesto.')
+        parser.add_argument('--max-postings', type=int, default=200, help='Máximo de repuestos por término al comparar.')
+
+    def handle(self, *args, **options):
+        fields = ('id', 'name', 'description', 'brand', 'model', 'year', 'category_id')
+        documents = {
+            row[0]: document_terms(*row[1:])
+            for row in Repuesto.objects.order_by('id').values_list(*fields).iterator(chunk_size=2000)
+        }
+        vectors = build_vectors(documents)
+        rows = nearest_neighbours(vectors, options['top_k'], max_postings=options['max_postings'])
+        path = index_path()
+        total = write_index(path, rows, options['top_k'])
+        self.stdout.write(self.style.SUCCESS(f'Índice de similares escrito en {path}. Repuestos: {total}.'))
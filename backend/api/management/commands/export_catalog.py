@@ -0,0 +1,44 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORT_FORMATS, export_catalog, parse_updated_since
+
+
+class Command(BaseCommand):
+    help = 'Exporta el catálogo completo de repuestos a CSV o NDJSON.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help='Archivo destino; "-" escribe en stdout.')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida con gzip.')
+        parser.add_argument('--updated-since', help='Solo repuestos modificados desde esta fecha (ISO).')
+        parser.add_argument('--base-url', default='', help='Prefijo para URLs de imágenes relativas, ej. https://api.ejemplo.com')
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            updated_since = parse_updated_since(options['updated_since'])
+        except ValueError:
+            raise CommandError('--updated-since debe ser una fecha ISO (AAAA-MM-DD).')
+
+        base_url = options['base_url'].rstrip('/')
+        chunks = export_catalog(
+            options['format'],
+            updated_since,
+            options['gzip'],
+            absolute_url=lambda url: base_url + url if url.startswith('/') else url,
+            chunk_size=options['chunk_size'],
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Catálogo exportado en {options["output"]} ({written} bytes).'))
@@ -0,0 +1,50 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.exports import EXPORT_FORMATS, export_orders, parse_date_until, parse_updated_since
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Exporta las órdenes con sus items, cupón y datos de envío a CSV o NDJSON (para contabilidad).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=EXPORT_FORMATS, default='csv')
+        parser.add_argument('--output', default='-', help='Archivo destino; "-" escribe en stdout.')
+        parser.add_argument('--gzip', action='store_true', help='Comprime la salida con gzip.')
+        parser.add_argument('--from', dest='created_from', help='Órdenes creadas desde esta fecha (ISO, inclusive).')
+        parser.add_argument('--to', dest='created_to', help='Órdenes creadas hasta esta fecha (ISO; una fecha sola incluye todo el día).')
+        parser.add_argument(
+            '--status', action='append', choices=[choice for choice, _ in Order.STATUS_CHOICES],
+            help='Filtra por estado; se puede repetir.',
+        )
+        parser.add_argument('--chunk-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        try:
+            created_from = parse_updated_since(options['created_from'])
+            created_until = parse_date_until(options['created_to'])
+        except ValueError:
+            raise CommandError('--from y --to deben ser fechas ISO (AAAA-MM-DD).')
+
+        chunks = export_orders(
+            options['format'],
+            created_from,
+            created_until,
+            options['status'],
+            options['gzip'],
+            chunk_size=options['chunk_size'],
+        )
+        if options['output'] == '-':
+            for chunk in chunks:
+                sys.stdout.buffer.write(chunk)
+            sys.stdout.buffer.flush()
+            return
+
+        written = 0
+        with open(options['output'], 'wb') as handle:
+            for chunk in chunks:
+                handle.write(chunk)
+                written += len(chunk)
+        self.stderr.write(self.style.SUCCESS(f'Órdenes exportadas en {options["output"]} ({written} bytes).'))
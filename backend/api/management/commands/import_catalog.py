@@ -0,0 +1,52 @@
+import time
+
+from django.core.management.base import BaseCommand, CommandError
+
+from api.imports import IMPORT_FORMATS, CatalogImporter, detect_format, open_source, read_rows
+
+
+class Command(BaseCommand):
+    help = 'Importa repuestos desde CSV o NDJSON (crea o actualiza por SKU).'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path', help='Archivo CSV/NDJSON (también .gz); "-" lee de stdin.')
+        parser.add_argument('--format', choices=IMPORT_FORMATS, help='Por defecto se deduce de la extensión.')
+        parser.add_argument('--batch-size', type=int, default=1000, help='Filas por bulk_create / bulk_update.')
+        parser.add_argument('--dry-run', action='store_true', help='Valida y cuenta sin escribir en la base.')
+        parser.add_argument('--create-categories', action='store_true', help='Crea las categorías que no existan (por nombre).')
+
+    def handle(self, *args, **options):
+        path = options['path']
+        import_format = options['format'] or detect_format(path)
+        try:
+            stream = open_source(path)
+        except OSError as exc:
+            raise CommandError(f'No se pudo abrir {path}: {exc}')
+
+        importer = CatalogImporter(
+            batch_size=options['batch_size'],
+            dry_run=options['dry_run'],
+            create_categories=options['create_categories'],
+        )
+        started = time.monotonic()
+
+        def progress(stats):
+            elapsed = time.monotonic() - started
+            self.stdout.write(f'  {stats["rows"]} filas ({stats["rows"] / elapsed:.0f} filas/s)')
+
+        with stream:
+            stats = importer.run(read_rows(stream, import_format), progress=progress)
+
+        for line, message in importer.errors:
+            self.stderr.write(f'Línea {line}: {message}')
+        if stats['errors'] > len(importer.errors):
+            self.stderr.write(f'... y {stats["errors"] - len(importer.errors)} errores más.')
+
+        elapsed = time.monotonic() - started
+        rate = stats['rows'] / elapsed if elapsed else stats['rows']
+        prefix = '[dry-run] ' if options['dry_run'] else ''
+        self.stdout.write(self.style.SUCCESS(
+            f'{prefix}Filas: {stats["rows"]}, creados: {stats["created"]}, actualizados: {stats["updated"]}, '
+            f'sin cambios: {stats["unchanged"]}, errores: {stats["errors"]}, '
+            f'notificaciones: {stats["notifications"]}. {elapsed:.1f}s ({rate:.0f} filas/s).'
+        ))
@@ -0,0 +1,11 @@
+from django.core.management.base import BaseCommand
+
+from api.idempotency import purge_expired
+
+
+class Command(BaseCommand):
+    help = 'Borra las Idempotency-Key vencidas (IDEMPOTENCY_KEY_TTL).'
+
+    def handle(self, *args, **options):
+        deleted = purge_expired()
+        self.stdout.write(self.style.SUCCESS(f'Claves vencidas borradas: {deleted}.'))
@@ -0,0 +1,13 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from api.models import refresh_category_stats
+
+
+class Command(BaseCommand):
+    help = 'Recalcula product_count / in_stock_count / min_price / max_price de cada categoría a partir de los repuestos.'
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            updated = refresh_category_stats()
+        self.stdout.write(self.style.SUCCESS(f'Contadores recalculados. Categorías: {updated}.'))
@@ -0,0 +1,19 @@
+from django.core.management.base import BaseCommand
+
+from api import order_search
+from api.models import Order
+
+
+class Command(BaseCommand):
+    help = 'Reconstruye el índice de búsqueda full-text (FTS5) de órdenes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--chunk-size', type=int, default=1000, help='Órdenes por lote al indexar.')
+
+    def handle(self, *args, **options):
+        if not order_search.fts_available():
+            self.stdout.write(self.style.WARNING('La base de datos no es SQLite; la búsqueda usa LIKE y no requiere índice.'))
+            return
+
+        total = order_search.rebuild_index(Order.objects.all(), chunk_size=options['chunk_size'])
+        self.stdout.write(self.style.SUCCESS(f'Índice de órdenes reconstruido. Órdenes indexadas: {total}.'))
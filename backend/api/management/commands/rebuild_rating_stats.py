@@ -0,0 +1,47 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from api.caching import bump_version
+from api.models import Repuesto, Review
+
+
+class Command(BaseCommand):
+    help = 'Recalcula rating_avg / rating_count de cada repuesto a partir de las reviews.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=500, help='Repuestos por bulk_update.')
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        stats = {
+            row['repuesto_id']: (row['total'], row['count'])
+            for row in Review.objects.values('repuesto_id').annotate(total=Sum('rating'), count=Count('id'))
+        }
+
+        fixed = 0
+        batch = []
+        fields = ('rating_total', 'rating_count', 'rating_avg')
+        # updated_at too, so ETag / Last-Modified of the fixed parts change.
+        update_fields = (*fields, 'updated_at')
+        now = timezone.now()
+        with transaction.atomic():
+            queryset = Repuesto.objects.only('id', *fields)
+            for repuesto in queryset.iterator(chunk_size=batch_size):
+                total, count = stats.get(repuesto.pk, (0, 0))
+                avg = total / count if count else 0
+                if (repuesto.rating_total, repuesto.rating_count) == (total, count) and abs(repuesto.rating_avg - avg) < 1e-9:
+                    continue
+                repuesto.rating_total, repuesto.rating_count, repuesto.rating_avg = total, count, avg
+                repuesto.updated_at = now
+                batch.append(repuesto)
+                if len(batch) >= batch_size:
+                    fixed += Repuesto.objects.bulk_update(batch, update_fields)
+                    batch = []
+            if batch:
+                fixed += Repuesto.objects.bulk_update(batch, update_fields)
+            if fixed:
+                bump_version(Repuesto)
+
+        self.stdout.write(self.style.SUCCESS(f'Ratings recalculados. Repuestos corregidos: {fixed}.'))
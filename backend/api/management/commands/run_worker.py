@@ -0,0 +1,40 @@
+import signal
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from api.jobs import TASKS, Worker
+
+
+class Command(BaseCommand):
+    help = 'Procesa la cola de trabajos en segundo plano (notificaciones, cupones vencidos, ...).'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--concurrency', type=int, default=getattr(settings, 'JOBS_WORKER_CONCURRENCY', 4),
+            help='Trabajos en paralelo.',
+        )
+        parser.add_argument(
+            '--pool', choices=('thread', 'process'), default=getattr(settings, 'JOBS_WORKER_POOL', 'thread'),
+            help='thread para tareas que esperan E/S, process para tareas que usan CPU.',
+        )
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Segundos entre consultas con la cola vacía.')
+        parser.add_argument('--once', action='store_true', help='Vaciar la cola y salir.')
+
+    def handle(self, *args, **options):
+        worker = Worker(options['concurrency'], options['pool'], options['poll_interval'])
+
+        def shutdown(signum, frame):
+            self.stdout.write('Deteniendo: se terminan los trabajos en curso...')
+            worker.stop()
+
+        signal.signal(signal.SIGTERM, shutdown)
+        signal.signal(signal.SIGINT, shutdown)
+        self.stdout.write(
+            f"Worker {worker.worker_id}: {options['concurrency']} x {options['pool']}, "
+            f"tareas: {', '.join(sorted(TASKS))}"
+        )
+        stats = worker.run(once=options['once'])
+        self.stdout.write(self.style.SUCCESS(
+            f"Trabajos tomados: {stats['claimed']}, completados: {stats['done']}, con error: {stats['failed']}."
+        ))
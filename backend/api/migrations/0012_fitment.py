@@ -0,0 +1,57 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:48
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+from api.search import fold_text
+
+
+def normalize_fitment_key(value):
+    return ' '.join(fold_text(value).split())
+
+
+def create_primary_fitments(apps, schema_editor):
+    Repuesto = apps.get_model('api', 'Repuesto')
+    Fitment = apps.get_model('api', 'Fitment')
+    fitments = [
+        Fitment(
+            repuesto_id=repuesto.id,
+            brand=repuesto.brand,
+            model=repuesto.model,
+            year_from=repuesto.year,
+            year_to=repuesto.year,
+            brand_key=normalize_fitment_key(repuesto.brand),
+            model_key=normalize_fitment_key(repuesto.model),
+            primary=True,
+        )
+        for repuesto in Repuesto.objects.exclude(brand='').iterator()
+    ]
+    Fitment.objects.bulk_create(fitments, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0011_repuesto_fts'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Fitment',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('brand', models.CharField(max_length=100)),
+                ('model', models.CharField(blank=True, max_length=100)),
+                ('year_from', models.PositiveIntegerField(blank=True, null=True)),
+                ('year_to', models.PositiveIntegerField(blank=True, null=True)),
+                ('brand_key', models.CharField(editable=False, max_length=100)),
+                ('model_key', models.CharField(blank=True, editable=False, max_length=100)),
+                ('primary', models.BooleanField(default=False)),
+                ('repuesto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='fitments', to='api.repuesto')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['brand_key', 'model_key', 'year_from', 'year_to'], name='fitment_vehicle_idx'), models.Index(fields=['model_key', 'year_from', 'year_to'], name='fitment_model_idx')],
+            },
+        ),
+        migrations.RunPython(create_primary_fitments, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,20 @@
+# Generated by Django 6.0.2 on 2026-10-18 07:40
+
+import django.utils.timezone
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0013_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='updated_at',
+            field=models.DateTimeField(auto_now=True, default=django.utils.timezone.now),
+            preserve_default=False,
+        ),
+    ]
@@ -0,0 +1,46 @@
+# Generated by Django 6.0.2 on 2026-10-18 06:55
+
+from django.db import migrations, models
+from django.db.models import Count, Sum
+
+
+def compute_rating_stats(apps, schema_editor):
+    Repuesto = apps.get_model('api', 'Repuesto')
+    Review = apps.get_model('api', 'Review')
+    stats = Review.objects.values('repuesto_id').annotate(total=Sum('rating'), count=Count('id'))
+    for row in stats.iterator():
+        Repuesto.objects.filter(pk=row['repuesto_id']).update(
+            rating_total=row['total'],
+            rating_count=row['count'],
+            rating_avg=row['total'] / row['count'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0014_categoria_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='repuesto',
+            name='rating_avg',
+            field=models.FloatField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='repuesto',
+            name='rating_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='repuesto',
+            name='rating_total',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['rating_avg', 'id'], name='repuesto_rating_idx'),
+        ),
+        migrations.RunPython(compute_rating_stats, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-18 08:05
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0015_repuesto_rating_stats'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='CoPurchaseRun',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('last_order_id', models.PositiveBigIntegerField(default=0)),
+                ('repuestos_updated', models.PositiveIntegerField(default=0)),
+                ('full', models.BooleanField(default=False)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+        migrations.CreateModel(
+            name='CoPurchase',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('orders', models.PositiveIntegerField(default=0)),
+                ('rank', models.PositiveSmallIntegerField()),
+                ('related', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='+', to='api.repuesto')),
+                ('repuesto', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='co_purchases', to='api.repuesto')),
+            ],
+            options={
+                'unique_together': {('repuesto', 'rank')},
+            },
+        ),
+    ]
@@ -0,0 +1,57 @@
+# Generated by Django 6.0.2 on 2026-10-18 14:10
+
+from django.db import migrations, models
+from django.db.models import Count, Max, Min, Q
+
+
+def compute_category_stats(apps, schema_editor):
+    Categoria = apps.get_model('api', 'Categoria')
+    Repuesto = apps.get_model('api', 'Repuesto')
+    stats = Repuesto.objects.values('category_id').annotate(
+        products=Count('id'),
+        in_stock=Count('id', filter=Q(stock__gt=0)),
+        low=Min('price'),
+        high=Max('price'),
+    )
+    for row in stats.iterator():
+        Categoria.objects.filter(pk=row['category_id']).update(
+            product_count=row['products'],
+            in_stock_count=row['in_stock'],
+            min_price=row['low'],
+            max_price=row['high'],
+        )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0016_copurchase'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='categoria',
+            name='in_stock_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='max_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='min_price',
+            field=models.DecimalField(blank=True, decimal_places=2, editable=False, max_digits=10, null=True),
+        ),
+        migrations.AddField(
+            model_name='categoria',
+            name='product_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddIndex(
+            model_name='repuesto',
+            index=models.Index(fields=['category', 'price'], name='repuesto_category_price_idx'),
+        ),
+        migrations.RunPython(compute_category_stats, migrations.RunPython.noop),
+    ]
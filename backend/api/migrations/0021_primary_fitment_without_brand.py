@@ -0,0 +1,45 @@
+# Generated by Django 6.0.2 on 2026-10-18 17:10
+
+from django.db import migrations
+from django.db.models import Q
+
+from api.search import fold_text
+
+
+def normalize_fitment_key(value):
+    return ' '.join(fold_text(value).split())
+
+
+def create_missing_primary_fitments(apps, schema_editor):
+    """Primary fitments used to require a brand; mirror repuestos that only have a model or year too."""
+    Repuesto = apps.get_model('api', 'Repuesto')
+    Fitment = apps.get_model('api', 'Fitment')
+    missing = (
+        Repuesto.objects.filter(~Q(model='') | Q(year__isnull=False))
+        .exclude(fitments__primary=True)
+    )
+    fitments = [
+        Fitment(
+            repuesto_id=repuesto.id,
+            brand=repuesto.brand,
+            model=repuesto.model,
+            year_from=repuesto.year,
+            year_to=repuesto.year,
+            brand_key=normalize_fitment_key(repuesto.brand),
+            model_key=normalize_fitment_key(repuesto.model),
+            primary=True,
+        )
+        for repuesto in missing.iterator()
+    ]
+    Fitment.objects.bulk_create(fitments, batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0020_job'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_missing_primary_fitments, migrations.RunPython.noop),
+    ]
@@ -1,14 +1,29 @@
-from django.db import models
+from collections import Counter
+
+from django.db import connection, models, transaction
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Coalesce
+from django.utils import timezone
 from django.utils.text import slugify
 from django.contrib.auth.models import User
-from django.db.models.signals import pre_save, post_save
+from django.core.serializers.json import DjangoJSONEncoder
+from django.db.models.signals import pre_save, post_save, post_delete
 from django.dispatch import receiver
 
+from . import caching, facets, jobs, order_search, search
+
 
 class Categoria(models.Model):
 	name = models.CharField(max_length=100, unique=True)
 	slug = models.SlugField(max_length=120, unique=True, blank=True)
 	description = models.TextField(blank=True)
+	updated_at = models.DateTimeField(auto_now=True)
+
+	# Denormalized from Repuesto, see adjust_category_stats(); rebuild with `manage.py rebuild_category_stats`.
+	product_count = models.PositiveIntegerField(default=0, editable=False)
+	in_stock_count = models.PositiveIntegerField(default=0, editable=False)
+	min_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
+	max_price = models.DecimalField(max_digits=10, decimal_places=2, blank=True, null=True, editable=False)
 
 	def save(self, *args, **kwargs):
 		if not self.slug:
@@ -33,10 +48,146 @@ class Repuesto(models.Model):
 	created_at = models.DateTimeField(auto_now_add=True)
 	updated_at = models.DateTimeField(auto_now=True)
 
+	# Denormalized from Review, see adjust_rating_stats(); rebuild with `manage.py rebuild_rating_stats`.
+	rating_total = models.PositiveIntegerField(default=0, editable=False)
+	rating_count = models.PositiveIntegerField(default=0, editable=False)
+	rating_avg = models.FloatField(default=0, editable=False)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['created_at', 'id'], name='repuesto_created_idx'),
+			models.Index(fields=['rating_avg', 'id'], name='repuesto_rating_idx'),
+			models.Index(fields=['category', 'price'], name='repuesto_category_price_idx'),
+		]
+
 	def __str__(self):
 		return self.name
 
 
+def adjust_rating_stats(repuesto_id, total_delta, count_delta):
+	"""Apply a review change to the Repuesto's rating columns in one UPDATE (from the Review signals below)."""
+	new_total = models.F('rating_total') + total_delta
+	new_count = models.F('rating_count') + count_delta
+	Repuesto.objects.filter(pk=repuesto_id).update(
+		rating_total=new_total,
+		rating_count=new_count,
+		rating_avg=models.Case(
+			models.When(rating_count=-count_delta, then=models.Value(0.0)),
+			default=models.ExpressionWrapper(new_total * 1.0 / new_count, output_field=models.FloatField()),
+			output_field=models.FloatField(),
+		),
+		updated_at=timezone.now(),
+	)
+	caching.bump_version(Repuesto)
+
+
+def _category_price(category, ordering):
+	return models.Subquery(Repuesto.objects.filter(category=category).order_by(ordering).values('price')[:1])
+
+
+def _category_count(**filters):
+	repuestos = Repuesto.objects.filter(category=models.OuterRef('pk'), **filters).order_by().values('category')
+	return Coalesce(models.Subquery(repuestos.annotate(total=models.Count('pk')).values('total')), 0)
+
+
+def adjust_category_stats(category_id, product_delta=0, in_stock_delta=0, prices=False):
+	"""Apply a Repuesto change to its Categoria's counters in one UPDATE; `prices` re-reads min/max from the (category, price) index."""
+	values = {'updated_at': timezone.now()}
+	if product_delta:
+		values['product_count'] = models.F('product_count') + product_delta
+	if in_stock_delta:
+		values['in_stock_count'] = models.F('in_stock_count') + in_stock_delta
+	if prices:
+		values['min_price'] = _category_price(category_id, 'price')
+		values['max_price'] = _category_price(category_id, '-price')
+	Categoria.objects.filter(pk=category_id).update(**values)
+	caching.bump_version(Categoria)
+
+
+def refresh_category_stats(category_ids=None):
+	"""Recompute the counters of the given categories (all when None) from Repuesto; used after bulk writes."""
+	queryset = Categoria.objects.all()
+	if category_ids is not None:
+		category_ids = set(category_ids)
+		if not category_ids:
+			return 0
+		queryset = queryset.filter(pk__in=category_ids)
+	updated = queryset.update(
+		product_count=_category_count(),
+		in_stock_count=_category_count(stock__gt=0),
+		min_price=_category_price(models.OuterRef('pk'), 'price'),
+		max_price=_category_price(models.OuterRef('pk'), '-price'),
+		updated_at=timezone.now(),
+	)
+	caching.bump_version(Categoria)
+	return updated
+
+
+def normalize_fitment_key(value):
+	return ' '.join(search.fold_text(value).split())
+
+
+def has_vehicle_data(repuesto):
+	"""Whether `repuesto` gets a primary Fitment: any of brand, model or year is set."""
+	return bool(repuesto.brand or repuesto.model or repuesto.year)
+
+
+def _prefix_upper_bound(prefix):
+	# Smallest string greater than every string starting with `prefix`, so prefix search is an index range scan.
+	return prefix[:-1] + chr(ord(prefix[-1]) + 1)
+
+
+class FitmentQuerySet(models.QuerySet):
+	def matching(self, brand='', model='', year_range=None):
+		"""Fitments for a vehicle. `brand`/`model` match by normalized prefix, `year_range` is (from, to)."""
+		qs = self
+		brand_key = normalize_fitment_key(brand)
+		model_key = normalize_fitment_key(model)
+		if brand_key:
+			qs = qs.filter(brand_key__gte=brand_key, brand_key__lt=_prefix_upper_bound(brand_key))
+		if model_key:
+			qs = qs.filter(model_key__gte=model_key, model_key__lt=_prefix_upper_bound(model_key))
+		if year_range:
+			# NULL years are open-ended only on admin-entered fitments; a primary row with no year
+			# just mirrors a Repuesto whose year is unknown, so it must not match every year.
+			year_from, year_to = year_range
+			qs = qs.filter(
+				models.Q(year_from__isnull=True, primary=False) | models.Q(year_from__lte=year_to),
+				models.Q(year_to__isnull=True, primary=False) | models.Q(year_to__gte=year_from),
+			)
+		return qs
+
+
+class Fitment(models.Model):
+	"""A vehicle (brand, model, year range) a Repuesto fits. Open-ended years are stored as NULL."""
+	repuesto = models.ForeignKey(Repuesto, related_name='fitments', on_delete=models.CASCADE)
+	brand = models.CharField(max_length=100)
+	model = models.CharField(max_length=100, blank=True)
+	year_from = models.PositiveIntegerField(blank=True, null=True)
+	year_to = models.PositiveIntegerField(blank=True, null=True)
+	brand_key = models.CharField(max_length=100, editable=False)
+	model_key = models.CharField(max_length=100, editable=False, blank=True)
+	# Mirrors the brand/model/year columns of the Repuesto itself (whenever any of them is set); kept in sync by a signal.
+	primary = models.BooleanField(default=False)
+
+	objects = FitmentQuerySet.as_manager()
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['brand_key', 'model_key', 'year_from', 'year_to'], name='fitment_vehicle_idx'),
+			models.Index(fields=['model_key', 'year_from', 'year_to'], name='fitment_model_idx'),
+		]
+
+	def save(self, *args, **kwargs):
+		self.brand_key = normalize_fitment_key(self.brand)
+		self.model_key = normalize_fitment_key(self.model)
+		super().save(*args, **kwargs)
+
+	def __str__(self):
+		years = f"{self.year_from or '...'}-{self.year_to or '...'}"
+		return f"{self.brand} {self.model} {years}".strip()
+
+
 class ImagenRepuesto(models.Model):
 	repuesto = models.ForeignKey(Repuesto, related_name='imagenes', on_delete=models.CASCADE)
 	image = models.ImageField(upload_to='repuestos/')
@@ -91,6 +242,12 @@ class Order(models.Model):
 	postal_code = models.CharField(max_length=20, blank=True)
 	country = models.CharField(max_length=60, default='Argentina')
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['created_at', 'id'], name='order_created_idx'),
+			models.Index(fields=['user', 'created_at', 'id'], name='order_user_created_idx'),
+		]
+
 	def __str__(self):
 		return f"Orden #{self.id} - {self.user.username}"
 
@@ -110,6 +267,105 @@ class OrderItem(models.Model):
 		return f"{self.name} x{self.qty}"
 
 
+class IdempotencyKey(models.Model):
+	"""A client-supplied `Idempotency-Key` and the response it produced (see idempotency.IdempotentCreateMixin).
+
+	`status_code` stays NULL while the first request is still running, with `expires_at`
+	only a short lease ahead (IDEMPOTENCY_LEASE_TTL) until it finishes. Expired rows are
+	reused on the next request with the same key and purged by `purge_idempotency_keys`.
+	"""
+	user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='+')
+	scope = models.CharField(max_length=50)
+	key = models.CharField(max_length=255)
+	fingerprint = models.CharField(max_length=64)
+	status_code = models.PositiveSmallIntegerField(null=True, blank=True)
+	response = models.JSONField(null=True, blank=True, encoder=DjangoJSONEncoder)
+	created_at = models.DateTimeField(auto_now_add=True)
+	expires_at = models.DateTimeField()
+
+	class Meta:
+		constraints = [
+			models.UniqueConstraint(fields=['user', 'scope', 'key'], name='idempotency_key_unique'),
+		]
+		indexes = [
+			models.Index(fields=['expires_at'], name='idempotency_expires_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.scope}:{self.key}"
+
+
+class Job(models.Model):
+	"""Background work queued with jobs.enqueue() and run by `manage.py run_worker`.
+
+	`dead` is the dead-letter state: the job failed `max_attempts` times and is kept
+	with its last traceback until someone requeues or deletes it.
+	"""
+	STATUS_CHOICES = (
+		('queued', 'En cola'),
+		('running', 'En ejecución'),
+		('done', 'Terminado'),
+		('dead', 'Fallido'),
+	)
+	task = models.CharField(max_length=100)
+	payload = models.JSONField(default=dict, blank=True, encoder=DjangoJSONEncoder)
+	status = models.CharField(max_length=10, choices=STATUS_CHOICES, default='queued')
+	attempts = models.PositiveSmallIntegerField(default=0)
+	max_attempts = models.PositiveSmallIntegerField(default=5)
+	run_at = models.DateTimeField(default=timezone.now)
+	locked_by = models.CharField(max_length=100, blank=True)
+	locked_at = models.DateTimeField(null=True, blank=True)
+	last_error = models.TextField(blank=True)
+	created_at = models.DateTimeField(auto_now_add=True)
+	finished_at = models.DateTimeField(null=True, blank=True)
+
+	class Meta:
+		indexes = [
+			models.Index(fields=['status', 'run_at', 'id'], name='job_claim_idx'),
+		]
+
+	def __str__(self):
+		return f"{self.task} #{self.pk} ({self.status})"
+
+
+class CacheVersion(models.Model):
+	"""Version of a cached model (see caching.bump_version), one row per model label.
+
+	Kept in the database rather than in the cache backend because the file and database
+	caches have no atomic `incr` across processes; `value = value + 1` in SQL does.
+	"""
+	name = models.CharField(max_length=100, primary_key=True)
+	value = models.BigIntegerField()
+
+	def __str__(self):
+		return f"{self.name}={self.value}"
+
+
+class CoPurchase(models.Model):
+	"""One of the top repuestos bought in the same orders as `repuesto` (see `build_recommendations`)."""
+	repuesto = models.ForeignKey(Repuesto, on_delete=models.CASCADE, related_name='co_purchases')
+	related = models.ForeignKey(Repuesto, on_delete=models.CASCADE, related_name='+')
+	orders = models.PositiveIntegerField(default=0)
+	rank = models.PositiveSmallIntegerField()
+
+	class Meta:
+		unique_together = ('repuesto', 'rank')
+
+	def __str__(self):
+		return f"{self.repuesto_id} -> {self.related_id} ({self.orders})"
+
+
+class CoPurchaseRun(models.Model):
+	"""Bookkeeping for incremental `build_recommendations` runs."""
+	last_order_id = models.PositiveBigIntegerField(default=0)
+	repuestos_updated = models.PositiveIntegerField(default=0)
+	full = models.BooleanField(default=False)
+	created_at = models.DateTimeField(auto_now_add=True)
+
+	def __str__(self):
+		return f"Recomendaciones hasta la orden #{self.last_order_id}"
+
+
 class Notification(models.Model):
 	NOTIFICATION_TYPES = (
 		('order_status', 'Cambio de estado de orden'),
@@ -124,6 +380,11 @@ class Notification(models.Model):
 	is_read = models.BooleanField(default=False)
 	created_at = models.DateTimeField(auto_now_add=True)
 
+	class Meta:
+		indexes = [
+			models.Index(fields=['user', 'created_at', 'id'], name='notification_user_created_idx'),
+		]
+
 	def __str__(self):
 		return f"{self.user.username} - {self.message}"
 
@@ -154,44 +415,231 @@ def create_status_notification(sender, instance, created, **kwargs):
 		)
 
 
+@receiver(post_save, sender=Order)
+def sync_order_search_index(sender, instance, **kwargs):
+	order_search.stage_order(instance.pk)
+
+
+@receiver(post_save, sender=OrderItem)
+@receiver(post_delete, sender=OrderItem)
+def sync_order_items_search_index(sender, instance, **kwargs):
+	if instance.order_id:
+		order_search.stage_order(instance.order_id)
+
+
+@receiver(post_delete, sender=Order)
+def remove_from_order_search_index(sender, instance, **kwargs):
+	order_search.remove_order(instance.pk)
+
+
 @receiver(pre_save, sender=Repuesto)
 def store_previous_stock(sender, instance, **kwargs):
+	instance._old_stock = instance._old_category_id = instance._old_price = None
 	if not instance.pk:
-		instance._old_stock = None
 		return
 	try:
 		old = Repuesto.objects.get(pk=instance.pk)
 		instance._old_stock = old.stock
+		instance._old_category_id = old.category_id
+		instance._old_price = old.price
 	except Repuesto.DoesNotExist:
-		instance._old_stock = None
+		pass
 
 
 @receiver(post_save, sender=Repuesto)
-def create_stock_notification(sender, instance, created, **kwargs):
-	if created:
+def update_category_stats(sender, instance, created, **kwargs):
+	in_stock = int(instance.stock > 0)
+	old_category_id = getattr(instance, '_old_category_id', None)
+	if created or old_category_id is None:
+		adjust_category_stats(instance.category_id, 1, in_stock, prices=True)
 		return
-	old_stock = getattr(instance, '_old_stock', None)
-	if old_stock is None or old_stock == instance.stock:
+	old_in_stock = int(instance._old_stock > 0)
+	if old_category_id != instance.category_id:
+		adjust_category_stats(old_category_id, -1, -old_in_stock, prices=True)
+		adjust_category_stats(instance.category_id, 1, in_stock, prices=True)
 		return
-	
+	price_changed = instance._old_price != instance.price
+	if in_stock != old_in_stock or price_changed:
+		adjust_category_stats(instance.category_id, 0, in_stock - old_in_stock, prices=price_changed)
+
+
+@receiver(post_delete, sender=Repuesto)
+def remove_from_category_stats(sender, instance, **kwargs):
+	adjust_category_stats(instance.category_id, -1, -int(instance.stock > 0), prices=True)
+
+
+def stock_alert(name, old_stock, new_stock):
+	"""(notification_type, message) when a stock change crosses a threshold, otherwise None."""
+	if old_stock is None or old_stock == new_stock:
+		return None
 	# Notificar a admins si el stock es bajo (<= 5)
-	if instance.stock <= 5 and old_stock > 5:
-		for admin in User.objects.filter(is_staff=True):
-			Notification.objects.create(
-				user=admin,
-				repuesto=instance,
-				notification_type='stock_low',
-				message=f"¡Stock bajo! {instance.name} tiene solo {instance.stock} unidades.",
-			)
+	if new_stock <= 5 and old_stock > 5:
+		return 'stock_low', f"¡Stock bajo! {name} tiene solo {new_stock} unidades."
 	# Notificar cuando el stock vuelve a niveles normales (> 20)
-	elif instance.stock > 20 and old_stock <= 20:
-		for admin in User.objects.filter(is_staff=True):
-			Notification.objects.create(
-				user=admin,
-				repuesto=instance,
-				notification_type='stock_high',
-				message=f"Stock recuperado: {instance.name} ahora tiene {instance.stock} unidades.",
+	if new_stock > 20 and old_stock <= 20:
+		return 'stock_high', f"Stock recuperado: {name} ahora tiene {new_stock} unidades."
+	return None
+
+
+@receiver(post_save, sender=Repuesto)
+def create_stock_notification(sender, instance, created, **kwargs):
+	if created:
+		return
+	alert = stock_alert(instance.name, getattr(instance, '_old_stock', None), instance.stock)
+	if alert is None:
+		return
+	# One notification per admin: fanned out by the worker, not in the request.
+	jobs.enqueue('notify_stock_alerts', {'alerts': [(instance.pk, *alert)]})
+
+
+def notify_stock_alerts(alerts):
+	"""Bulk-create the admin notifications for [(repuesto_id, notification_type, message), ...]."""
+	if not alerts:
+		return 0
+	admins = list(User.objects.filter(is_staff=True).values_list('id', flat=True))
+	Notification.objects.bulk_create([
+		Notification(user_id=admin, repuesto_id=repuesto_id, notification_type=kind, message=message)
+		for repuesto_id, kind, message in alerts
+		for admin in admins
+	], batch_size=500)
+	return len(alerts) * len(admins)
+
+
+class OutOfStock(Exception):
+	def __init__(self, repuesto_id):
+		super().__init__(repuesto_id)
+		self.repuesto_id = repuesto_id
+
+
+def case_by_pk(column, branches, output_field):
+	"""`CASE id WHEN pk THEN value [or column + value] ... ELSE column END` for [(pk, value, relative)].
+
+	Built as one RawSQL node: an equivalent Case(When(pk=...), ...) takes about a
+	millisecond per row just to resolve, which dominates large feeds.
+	"""
+	quote = connection.ops.quote_name
+	sql, params = [], []
+	for pk, value, relative in branches:
+		sql.append(f'WHEN %s THEN {quote(column)} + %s' if relative else 'WHEN %s THEN %s')
+		params += [pk, value]
+	return RawSQL(f'CASE {quote("id")} {" ".join(sql)} ELSE {quote(column)} END', params, output_field=output_field)
+
+
+def reserve_stock(quantities):
+	"""Take {repuesto_id: qty} out of stock with one conditional UPDATE; call inside the order's transaction.
+
+	Rows are decremented only `WHERE stock >= qty`, so concurrent checkouts cannot
+	oversell. If fewer rows than requested were updated, the UPDATE is rolled back to
+	its savepoint and OutOfStock names the first repuesto that is short. The work of
+	the skipped save() signals (stock notifications, category counters, cache version)
+	is done once at the end, with a constant number of queries.
+	"""
+	if not quantities:
+		return
+	now = timezone.now()
+	field = models.PositiveIntegerField()
+	required = case_by_pk('stock', [(pk, qty, False) for pk, qty in quantities.items()], field)
+	try:
+		with transaction.atomic():
+			reserved = Repuesto.objects.filter(pk__in=quantities, stock__gte=required).update(
+				stock=case_by_pk('stock', [(pk, -qty, True) for pk, qty in quantities.items()], field),
+				updated_at=now,
 			)
+			if reserved != len(quantities):
+				raise OutOfStock(None)
+	except OutOfStock:
+		available = dict(Repuesto.objects.filter(pk__in=quantities).values_list('pk', 'stock'))
+		raise OutOfStock(next(pk for pk in sorted(quantities) if available.get(pk, 0) < quantities[pk]))
+
+	alerts = []
+	emptied = Counter()
+	for pk, name, stock, category_id in Repuesto.objects.filter(pk__in=quantities).values_list('pk', 'name', 'stock', 'category_id'):
+		alert = stock_alert(name, stock + quantities[pk], stock)
+		if alert:
+			alerts.append((pk, *alert))
+		if not stock:
+			emptied[category_id] += 1
+	if alerts:
+		jobs.enqueue('notify_stock_alerts', {'alerts': alerts})
+	if emptied:
+		Categoria.objects.filter(pk__in=emptied).update(
+			in_stock_count=case_by_pk('in_stock_count', [(pk, -count, True) for pk, count in emptied.items()], field),
+			updated_at=now,
+		)
+		caching.bump_version(Categoria)
+	caching.bump_version(Repuesto)
+	# Stock is not a facet: let the facet index accept the version bump without a rebuild.
+	facets.facet_index.stage_many({})
+
+
+@receiver(post_save, sender=Repuesto)
+def sync_search_index(sender, instance, **kwargs):
+	update_fields = kwargs.get('update_fields')
+	if update_fields and not set(update_fields) & set(search.FTS_COLUMNS):
+		return
+	search.index_repuesto(instance)
+
+
+@receiver(post_save, sender=Repuesto)
+def sync_primary_fitment(sender, instance, created, **kwargs):
+	update_fields = kwargs.get('update_fields')
+	if update_fields and not set(update_fields) & {'brand', 'model', 'year'}:
+		return
+	if not has_vehicle_data(instance):
+		if not created:
+			Fitment.objects.filter(repuesto=instance, primary=True).delete()
+		return
+	fitment = None if created else Fitment.objects.filter(repuesto=instance, primary=True).first()
+	fitment = fitment or Fitment(repuesto=instance, primary=True)
+	fitment.brand = instance.brand
+	fitment.model = instance.model
+	fitment.year_from = instance.year
+	fitment.year_to = instance.year
+	fitment.save()
+
+
+def sync_primary_fitments(repuestos):
+	"""Batch `sync_primary_fitment` for rows written with bulk_create/bulk_update (no signals, no version bump)."""
+	repuestos = list(repuestos)
+	existing = {
+		fitment.repuesto_id: fitment
+		for fitment in Fitment.objects.filter(repuesto__in=repuestos, primary=True)
+	}
+	to_create, to_update, to_delete = [], [], []
+	for repuesto in repuestos:
+		fitment = existing.get(repuesto.pk)
+		if not has_vehicle_data(repuesto):
+			if fitment:
+				to_delete.append(fitment.pk)
+			continue
+		fitment = fitment or Fitment(repuesto=repuesto, primary=True)
+		fitment.brand = repuesto.brand
+		fitment.model = repuesto.model
+		fitment.year_from = repuesto.year
+		fitment.year_to = repuesto.year
+		fitment.brand_key = normalize_fitment_key(fitment.brand)
+		fitment.model_key = normalize_fitment_key(fitment.model)
+		(to_update if fitment.pk else to_create).append(fitment)
+	if to_delete:
+		Fitment.objects.filter(pk__in=to_delete).delete()
+	Fitment.objects.bulk_update(to_update, ['brand', 'model', 'year_from', 'year_to', 'brand_key', 'model_key'], batch_size=500)
+	Fitment.objects.bulk_create(to_create, batch_size=500)
+
+
+@receiver(post_save, sender=ImagenRepuesto)
+@receiver(post_delete, sender=ImagenRepuesto)
+@receiver(post_save, sender=Fitment)
+@receiver(post_delete, sender=Fitment)
+def touch_repuesto(sender, instance, **kwargs):
+	# Images and fitments are part of the product, so they move its updated_at (used by ETags).
+	if getattr(instance, 'primary', False):
+		return
+	Repuesto.objects.filter(pk=instance.repuesto_id).update(updated_at=timezone.now())
+
+
+@receiver(post_delete, sender=Repuesto)
+def remove_from_search_index(sender, instance, **kwargs):
+	search.remove_repuesto(instance.pk)
 
 
 class Favorite(models.Model):
@@ -233,3 +681,62 @@ class Coupon(models.Model):
 	def __str__(self):
 		return f"{self.code} (-{self.discount_value}{'%' if self.discount_type == 'percent' else '$'})"
 
+
+
+@receiver(pre_save, sender=Review)
+def store_previous_rating(sender, instance, **kwargs):
+	instance._old_rating = None
+	if not instance.pk:
+		return
+	old = Review.objects.filter(pk=instance.pk)
+	if connection.in_atomic_block:
+		# Locked, so two concurrent edits cannot both apply a delta from the same old rating.
+		old = old.select_for_update()
+	instance._old_rating = old.values_list('repuesto_id', 'rating').first()
+
+
+@receiver(post_save, sender=Review)
+def update_rating_stats(sender, instance, created, **kwargs):
+	update_fields = kwargs.get('update_fields')
+	if update_fields and not set(update_fields) & {'rating', 'repuesto'}:
+		return
+	old = getattr(instance, '_old_rating', None)
+	if created or old is None:
+		adjust_rating_stats(instance.repuesto_id, instance.rating, 1)
+		return
+	old_repuesto_id, old_rating = old
+	if old_repuesto_id != instance.repuesto_id:
+		adjust_rating_stats(old_repuesto_id, -old_rating, -1)
+		adjust_rating_stats(instance.repuesto_id, instance.rating, 1)
+	elif old_rating != instance.rating:
+		adjust_rating_stats(instance.repuesto_id, instance.rating - old_rating, 0)
+
+
+@receiver(post_delete, sender=Review)
+def remove_from_rating_stats(sender, instance, **kwargs):
+	adjust_rating_stats(instance.repuesto_id, -instance.rating, -1)
+
+
+@receiver(post_save, sender=Categoria)
+@receiver(post_delete, sender=Categoria)
+@receiver(post_save, sender=Repuesto)
+@receiver(post_delete, sender=Repuesto)
+@receiver(post_save, sender=ImagenRepuesto)
+@receiver(post_delete, sender=ImagenRepuesto)
+@receiver(post_save, sender=Fitment)
+@receiver(post_delete, sender=Fitment)
+@receiver(post_save, sender=Coupon)
+@receiver(post_delete, sender=Coupon)
+def bump_catalog_cache_version(sender, **kwargs):
+	caching.bump_version(sender)
+
+
+# Must stay below bump_catalog_cache_version: the facet index expects the version bump to run first.
+@receiver(post_save, sender=Repuesto)
+def update_facet_index(sender, instance, **kwargs):
+	facets.facet_index.stage(instance.pk, facets.facet_row(instance))
+
+
+@receiver(post_delete, sender=Repuesto)
+def remove_from_facet_index(sender, instance, **kwargs):
+	facets.facet_index.stage(instance.pk, None)
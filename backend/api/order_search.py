@@ -0,0 +1,152 @@
+from collections import defaultdict
+
+from django.conf import settings
+from django.db import DatabaseError, connection, transaction
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .search import build_match_query, fold_text, fts_available, order_by_rank
+
+FTS_TABLE = 'api_order_fts'
+FTS_COLUMNS = ('number', 'customer', 'dni', 'phone', 'address', 'skus')
+# bm25 weights, same order as FTS_COLUMNS: the order number and the customer beat the address.
+FTS_WEIGHTS = (10.0, 8.0, 6.0, 6.0, 2.0, 4.0)
+INSERT_SQL = f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s, %s)"
+
+
+def create_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(FTS_COLUMNS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _with_digits(value):
+    # "30.123.456" is also indexed as "30123456", so DNI and phone match typed with or without separators.
+    digits = ''.join(ch for ch in value or '' if ch.isdigit())
+    return f'{value} {digits}' if digits else (value or '')
+
+
+def _documents(orders):
+    """[rowid, *columns] per Order (user already loaded); SKUs come from one query for the whole batch."""
+    if not orders:
+        return []
+    item_model = orders[0]._meta.get_field('items').related_model
+    skus = defaultdict(list)
+    items = item_model.objects.filter(order_id__in=[order.pk for order in orders]).exclude(sku=None)
+    for order_id, sku in items.values_list('order_id', 'sku'):
+        skus[order_id].append(sku)
+    rows = []
+    for order in orders:
+        user = order.user
+        customer = ' '.join((user.username, user.email, user.first_name, user.last_name))
+        address = ' '.join((order.address_line1, order.address_line2, order.city, order.province, order.postal_code))
+        rows.append([
+            order.pk,
+            str(order.pk),
+            fold_text(customer),
+            fold_text(_with_digits(order.dni)),
+            fold_text(_with_digits(order.phone)),
+            fold_text(address),
+            fold_text(' '.join(skus[order.pk])),
+        ])
+    return rows
+
+
+def index_orders(order_ids):
+    """(Re)index the given orders with one DELETE and one executemany INSERT; missing ids are just removed."""
+    if not fts_available() or not order_ids:
+        return
+    from .models import Order
+    order_ids = list(order_ids)
+    orders = list(Order.objects.filter(pk__in=order_ids).select_related('user'))
+    placeholders = ', '.join(['%s'] * len(order_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', order_ids)
+        cursor.executemany(INSERT_SQL, _documents(orders))
+
+
+def stage_order(order_id):
+    """Reindex after commit, once the order's items are written too."""
+    transaction.on_commit(lambda: index_orders([order_id]))
+
+
+def remove_order(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_index(queryset, chunk_size=1000):
+    """Recreate the FTS table from scratch. Returns the number of indexed rows."""
+    drop_index()
+    create_index()
+    total = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for order in queryset.select_related('user').order_by('pk').iterator(chunk_size=chunk_size):
+            batch.append(order)
+            if len(batch) >= chunk_size:
+                cursor.executemany(INSERT_SQL, _documents(batch))
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(INSERT_SQL, _documents(batch))
+            total += len(batch)
+    return total
+
+
+def ranked_ids(match_query, limit):
+    """Best-ranked Order ids for a MATCH expression, best first."""
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [match_query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def like_filter(queryset, value):
+    """Plain icontains search, for databases without FTS5."""
+    item_model = queryset.model._meta.get_field('items').related_model
+    condition = (
+        Q(user__username__icontains=value)
+        | Q(user__email__icontains=value)
+        | Q(dni__icontains=value)
+        | Q(phone__icontains=value)
+        | Q(address_line1__icontains=value)
+        # A subquery rather than a join, so list annotations over items are not multiplied.
+        | Q(pk__in=item_model.objects.filter(sku__icontains=value).values('order_id'))
+    )
+    if value.isdigit():
+        condition |= Q(id=value)
+    return queryset.filter(condition)
+
+
+def search_orders(queryset, value):
+    """Orders matching every term of `value` (prefix match), best-ranked first."""
+    if not fts_available():
+        return like_filter(queryset, value)
+    match_query = build_match_query(value)
+    if not match_query:
+        return queryset.none()
+    try:
+        top_ids = ranked_ids(match_query, getattr(settings, 'SEARCH_RANK_LIMIT', 200))
+    except DatabaseError:
+        # Index missing (migrations not applied yet) or a malformed query: degrade to LIKE scans.
+        return like_filter(queryset, value)
+    queryset = queryset.filter(
+        pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match_query,))
+    )
+    return order_by_rank(queryset, top_ids)
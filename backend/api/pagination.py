@@ -1,5 +1,13 @@
+import base64
+import json
+
+from django.core.exceptions import ValidationError as DjangoValidationError
 from django.core.paginator import InvalidPage
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class SafePageNumberPagination(PageNumberPagination):
@@ -28,3 +36,136 @@ class SafePageNumberPagination(PageNumberPagination):
 
         self.display_page_controls = paginator.num_pages > 1
         return list(self.page)
+
+
+class KeysetPagination(SafePageNumberPagination):
+    """Page numbers by default; sending `?cursor=` switches to keyset pagination.
+
+    Keyset pages are keyed on the active ordering (from OrderingFilter, else
+    `cursor_ordering` on the view, else `-created_at`) plus the primary key as a
+    tie-breaker. They never run COUNT(*) or OFFSET, so every page costs the same
+    index range scan no matter how deep the client scrolls. NULLs sort first.
+    """
+
+    cursor_query_param = 'cursor'
+    default_cursor_ordering = ('-created_at',)
+    invalid_cursor_message = 'Cursor inválido.'
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.cursor_mode = self.cursor_query_param in request.query_params
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        self.request = request
+        self.base_url = request.build_absolute_uri()
+        self.page_size = self.get_page_size(request)
+        if not self.page_size:
+            return None
+        self.display_page_controls = False
+
+        model = queryset.model
+        self.ordering = self.get_cursor_ordering(request, queryset, view)
+        self.fields = [model._meta.get_field(name.lstrip('-')) for name in self.ordering]
+        values, reverse = self.decode_cursor(request)
+
+        ordering = [_flip(name) for name in self.ordering] if reverse else list(self.ordering)
+        queryset = queryset.order_by(*[_order_expression(name) for name in ordering])
+        if values is not None:
+            queryset = queryset.filter(self._after(ordering, values))
+
+        results = list(queryset[:self.page_size + 1])
+        has_more = len(results) > self.page_size
+        results = results[:self.page_size]
+        if reverse:
+            results.reverse()
+
+        self.page_items = results
+        self.has_next = has_more if not reverse else values is not None
+        self.has_previous = values is not None if not reverse else has_more
+        return results
+
+    def get_cursor_ordering(self, request, queryset, view):
+        local_fields = {f.name for f in queryset.model._meta.concrete_fields}
+        ordering = None
+        for backend in getattr(view, 'filter_backends', ()):
+            if hasattr(backend, 'get_ordering') and request.query_params.get(getattr(backend, 'ordering_param', 'ordering')):
+                ordering = backend().get_ordering(request, queryset, view)
+                break
+        if ordering:
+            ordering = [name for name in ordering if name.lstrip('-') in local_fields]
+        if not ordering:
+            ordering = list(getattr(view, 'cursor_ordering', self.default_cursor_ordering))
+        pk_name = queryset.model._meta.pk.name
+        if not any(name.lstrip('-') in {pk_name, 'pk'} for name in ordering):
+            ordering.append(f"-{pk_name}" if ordering[0].startswith('-') else pk_name)
+        return tuple(ordering)
+
+    def _after(self, ordering, values):
+        """Rows strictly after `values` in `ordering`: (a > va) OR (a = va AND b > vb) OR ..."""
+        condition = Q(pk__in=[])
+        equal = Q()
+        for name, value in zip(ordering, values):
+            field = name.lstrip('-')
+            if name.startswith('-'):
+                step = Q(pk__in=[]) if value is None else Q(**{f'{field}__lt': value}) | Q(**{f'{field}__isnull': True})
+            else:
+                step = Q(**{f'{field}__isnull': False}) if value is None else Q(**{f'{field}__gt': value})
+            condition |= equal & step
+            equal &= Q(**{f'{field}__isnull': True}) if value is None else Q(**{field: value})
+        return condition
+
+    def decode_cursor(self, request):
+        raw = request.query_params.get(self.cursor_query_param, '')
+        if not raw:
+            return None, False
+        try:
+            payload = json.loads(base64.urlsafe_b64decode(raw.encode('ascii')).decode('utf-8'))
+            raw_values = payload['v']
+            if len(raw_values) != len(self.fields):
+                raise ValueError
+            values = [None if value is None else field.to_python(value) for field, value in zip(self.fields, raw_values)]
+        except (TypeError, ValueError, KeyError, DjangoValidationError, UnicodeError):
+            raise NotFound(self.invalid_cursor_message)
+        return values, bool(payload.get('r'))
+
+    def encode_cursor(self, instance, reverse):
+        values = [
+            None if getattr(instance, field.attname) is None else field.value_to_string(instance)
+            for field in self.fields
+        ]
+        payload = json.dumps({'v': values, 'r': 1 if reverse else 0}, separators=(',', ':'))
+        cursor = base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+        return replace_query_param(self.base_url, self.cursor_query_param, cursor)
+
+    def get_next_link(self):
+        if not self.cursor_mode:
+            return super().get_next_link()
+        if not self.has_next or not self.page_items:
+            return None
+        return self.encode_cursor(self.page_items[-1], reverse=False)
+
+    def get_previous_link(self):
+        if not self.cursor_mode:
+            return super().get_previous_link()
+        if not self.has_previous or not self.page_items:
+            return None
+        return self.encode_cursor(self.page_items[0], reverse=True)
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({
+            'next': self.get_next_link(),
+            'previous': self.get_previous_link(),
+            'results': data,
+        })
+
+
+def _flip(name):
+    return name[1:] if name.startswith('-') else f'-{name}'
+
+
+def _order_expression(name):
+    if name.startswith('-'):
+        return F(name[1:]).desc(nulls_last=True)
+    return F(name).asc(nulls_first=True)
@@ -0,0 +1,107 @@
+from decimal import ROUND_HALF_UP, Decimal
+
+from django.conf import settings
+from django.utils import timezone
+
+from . import caching
+from .models import Coupon, Repuesto
+
+CENT = Decimal('0.01')
+COUPON_CACHE_KEY = 'coupon:{}:{}'
+# Cached for codes that do not exist, so guessing codes does not reach the database either.
+_NO_COUPON = 'none'
+
+
+def money(value):
+    return Decimal(value).quantize(CENT, rounding=ROUND_HALF_UP)
+
+
+def get_coupon(code):
+    """Active coupon for `code` or None, from the catalog cache.
+
+    Entries are keyed by the Coupon cache version (bumped when a coupon is saved or
+    deleted) and live COUPON_CACHE_TIMEOUT seconds, so `times_used` can lag that long;
+    order creation re-reads the coupon from the database.
+    """
+    cache = caching.get_cache()
+    version, = caching.get_versions([Coupon])
+    key = COUPON_CACHE_KEY.format(version, code)
+    coupon = cache.get(key)
+    if coupon is None:
+        coupon = Coupon.objects.filter(code=code, active=True).first() or _NO_COUPON
+        cache.set(key, coupon, getattr(settings, 'COUPON_CACHE_TIMEOUT', 60))
+    return None if coupon == _NO_COUPON else coupon
+
+
+def coupon_error(coupon, now=None):
+    """Why `coupon` cannot be used right now, or None if it can."""
+    if coupon is None:
+        return 'Cupón inválido o inactivo'
+    now = now or timezone.now()
+    if now < coupon.valid_from or now > coupon.valid_to:
+        return 'Cupón expirado o no válido aún'
+    if coupon.usage_limit and coupon.times_used >= coupon.usage_limit:
+        return 'Cupón agotado'
+    return None
+
+
+def coupon_discount(coupon, subtotal):
+    """Discount `coupon` gives on `subtotal`, never more than the subtotal itself."""
+    if coupon.discount_type == 'percent':
+        discount = subtotal * coupon.discount_value / 100
+    else:
+        discount = coupon.discount_value
+    return money(min(discount, subtotal))
+
+
+def quote_cart(items, coupon_code=''):
+    """Price `items` ({'repuesto_id', 'qty'}) at current prices: one Repuesto query, coupon from cache."""
+    quantities = {}
+    for item in items:
+        quantities[item['repuesto_id']] = quantities.get(item['repuesto_id'], 0) + item['qty']
+    repuestos = Repuesto.objects.only('id', 'name', 'sku', 'price', 'stock').in_bulk(quantities)
+
+    lines = []
+    subtotal = Decimal('0')
+    for repuesto_id, qty in quantities.items():
+        repuesto = repuestos.get(repuesto_id)
+        if repuesto is None:
+            continue
+        line_total = repuesto.price * qty
+        subtotal += line_total
+        lines.append({
+            'repuesto_id': repuesto.pk,
+            'name': repuesto.name,
+            'sku': repuesto.sku,
+            'price': str(repuesto.price),
+            'qty': qty,
+            'line_total': str(money(line_total)),
+            'stock': repuesto.stock,
+            'available': repuesto.stock >= qty,
+        })
+
+    coupon = error = None
+    discount = money(0)
+    coupon_code = (coupon_code or '').strip().upper()
+    if coupon_code:
+        coupon = get_coupon(coupon_code)
+        error = coupon_error(coupon)
+        if error:
+            coupon = None
+        else:
+            discount = coupon_discount(coupon, subtotal)
+
+    return {
+        'items': lines,
+        'missing': sorted(set(quantities) - set(repuestos)),
+        'all_available': all(line['available'] for line in lines),
+        'subtotal': str(money(subtotal)),
+        'coupon': {
+            'code': coupon.code,
+            'discount_type': coupon.discount_type,
+            'discount_value': str(coupon.discount_value),
+        } if coupon else None,
+        'coupon_error': error,
+        'discount': str(discount),
+        'total': str(money(subtotal - discount)),
+    }
@@ -0,0 +1,48 @@
+import heapq
+from collections import Counter
+from itertools import groupby
+from operator import itemgetter
+
+from django.db import transaction
+
+from .models import CoPurchase, OrderItem
+
+
+def count_co_purchases(anchor_ids, chunk_size=2000):
+    """{anchor id: Counter(other repuesto id -> orders containing both)} for a batch of anchors.
+
+    Only orders that contain one of the anchors are streamed, sorted by order, so memory
+    is bounded by the neighbours of the batch rather than by the whole order history.
+    """
+    anchors = set(anchor_ids)
+    counts = {pk: Counter() for pk in anchors}
+    orders = OrderItem.objects.filter(repuesto_id__in=anchors).values('order_id')
+    rows = (
+        OrderItem.objects.filter(order_id__in=orders, repuesto__isnull=False)
+        .order_by('order_id')
+        .values_list('order_id', 'repuesto_id')
+        .iterator(chunk_size=chunk_size)
+    )
+    for _, group in groupby(rows, key=itemgetter(0)):
+        items = {repuesto_id for _, repuesto_id in group}
+        for anchor in items & anchors:
+            counts[anchor].update(items - {anchor})
+    return counts
+
+
+def top_neighbours(counter, top_k):
+    """Most co-purchased first; ties go to the lower id so reruns are stable."""
+    return heapq.nsmallest(top_k, counter.items(), key=lambda item: (-item[1], item[0]))
+
+
+def store_co_purchases(counts, top_k):
+    """Replace the stored neighbours of every anchor in `counts`."""
+    rows = [
+        CoPurchase(repuesto_id=anchor, related_id=related, orders=orders, rank=rank)
+        for anchor, counter in counts.items()
+        for rank, (related, orders) in enumerate(top_neighbours(counter, top_k))
+    ]
+    with transaction.atomic():
+        CoPurchase.objects.filter(repuesto_id__in=list(counts)).delete()
+        CoPurchase.objects.bulk_create(rows, batch_size=1000)
+    return len(rows)
@@ -0,0 +1,167 @@
+import re
+import unicodedata
+
+from django.conf import settings
+from django.db import DatabaseError, connection
+from django.db.models import Case, IntegerField, Value, When
+from django.db.models.expressions import RawSQL
+from rest_framework.filters import SearchFilter
+
+FTS_TABLE = 'api_repuesto_fts'
+FTS_COLUMNS = ('name', 'description', 'sku', 'brand', 'model')
+# bm25 weights, same order as FTS_COLUMNS: a hit in the name or SKU beats one in the description.
+FTS_WEIGHTS = (10.0, 1.0, 8.0, 4.0, 4.0)
+
+_TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+
+
+def fold_text(value):
+    """Lowercase and strip accents so "Suspensión" and "suspension" index the same."""
+    if not value:
+        return ''
+    decomposed = unicodedata.normalize('NFKD', str(value))
+    return ''.join(ch for ch in decomposed if not unicodedata.combining(ch)).lower()
+
+
+def tokenize(value):
+    return _TOKEN_RE.findall(fold_text(value))
+
+
+def build_match_query(value):
+    """Turn free user input into an FTS5 MATCH expression (prefix match, every term required)."""
+    terms = tokenize(value)
+    return ' '.join(f'"{term}"*' for term in terms)
+
+
+def fts_available():
+    return connection.vendor == 'sqlite'
+
+
+def create_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        cursor.execute(
+            f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+            f"{', '.join(FTS_COLUMNS)}, tokenize='unicode61 remove_diacritics 2')"
+        )
+
+
+def drop_index(schema_connection=None):
+    conn = schema_connection or connection
+    with conn.cursor() as cursor:
+        cursor.execute(f'DROP TABLE IF EXISTS {FTS_TABLE}')
+
+
+def _document(repuesto):
+    return [fold_text(getattr(repuesto, column)) for column in FTS_COLUMNS]
+
+
+def index_repuesto(repuesto):
+    index_repuestos([repuesto])
+
+
+def index_repuestos(repuestos):
+    """(Re)index several rows with one DELETE and one executemany INSERT."""
+    if not fts_available() or not repuestos:
+        return
+    placeholders = ', '.join(['%s'] * len(repuestos))
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})', [r.pk for r in repuestos])
+        cursor.executemany(
+            f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)",
+            [[repuesto.pk, *_document(repuesto)] for repuesto in repuestos],
+        )
+
+
+def remove_repuesto(pk):
+    if not fts_available():
+        return
+    with connection.cursor() as cursor:
+        cursor.execute(f'DELETE FROM {FTS_TABLE} WHERE rowid = %s', [pk])
+
+
+def rebuild_index(queryset, chunk_size=1000):
+    """Recreate the FTS table from scratch. Returns the number of indexed rows."""
+    drop_index()
+    create_index()
+    insert_sql = f"INSERT INTO {FTS_TABLE} (rowid, {', '.join(FTS_COLUMNS)}) VALUES (%s, %s, %s, %s, %s, %s)"
+    total = 0
+    batch = []
+    with connection.cursor() as cursor:
+        for repuesto in queryset.only('id', *FTS_COLUMNS).iterator(chunk_size=chunk_size):
+            batch.append([repuesto.pk, *_document(repuesto)])
+            if len(batch) >= chunk_size:
+                cursor.executemany(insert_sql, batch)
+                total += len(batch)
+                batch = []
+        if batch:
+            cursor.executemany(insert_sql, batch)
+            total += len(batch)
+    return total
+
+
+def ranked_ids(match_query, limit):
+    """Best-ranked Repuesto ids for a MATCH expression, best first."""
+    weights = ', '.join(str(w) for w in FTS_WEIGHTS)
+    with connection.cursor() as cursor:
+        cursor.execute(
+            f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s '
+            f'ORDER BY bm25({FTS_TABLE}, {weights}) LIMIT %s',
+            [match_query, limit],
+        )
+        return [row[0] for row in cursor.fetchall()]
+
+
+def order_by_rank(queryset, top_ids):
+    """Order `queryset` by position in `top_ids` (best first); rows outside it follow by id."""
+    if not top_ids:
+        return queryset.none()
+
+    return queryset.annotate(
+        search_rank=Case(
+            *[When(pk=pk, then=Value(position)) for position, pk in enumerate(top_ids)],
+            default=Value(len(top_ids)),
+            output_field=IntegerField(),
+        )
+    ).order_by('search_rank', 'id')
+
+
+class RepuestoSearchFilter(SearchFilter):
+    """`?search=` backed by the FTS5 index, ranked by relevance.
+
+    Every match is returned; the best `SEARCH_RANK_LIMIT` hits are ordered by bm25
+    score (unless the client asks for another `ordering`) and the rest follow by id.
+    Falls back to the stock icontains SearchFilter on non-SQLite databases. With
+    `?fuzzy=true` the trigram index (see fuzzy.py) answers instead, typos included:
+    only the `SEARCH_RANK_LIMIT` most similar names and SKUs are returned.
+    """
+
+    fuzzy_param = 'fuzzy'
+
+    def filter_queryset(self, request, queryset, view):
+        search = request.query_params.get(self.search_param, '')
+        if search.strip() and request.query_params.get(self.fuzzy_param, '').lower() in ('1', 'true'):
+            from .fuzzy import trigram_index
+            top_ids = trigram_index.search(search, getattr(settings, 'SEARCH_RANK_LIMIT', 200))
+            return self.rank_by(queryset.filter(pk__in=top_ids), top_ids)
+        if not search.strip() or not fts_available():
+            return super().filter_queryset(request, queryset, view)
+
+        match_query = build_match_query(search)
+        if not match_query:
+            return queryset.none()
+
+        rank_limit = getattr(settings, 'SEARCH_RANK_LIMIT', 200)
+        try:
+            top_ids = ranked_ids(match_query, rank_limit)
+        except DatabaseError:
+            # Index missing (migrations not applied yet) or a malformed query: degrade to LIKE scans.
+            return super().filter_queryset(request, queryset, view)
+
+        queryset = queryset.filter(
+            pk__in=RawSQL(f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', (match_query,))
+        )
+        return self.rank_by(queryset, top_ids)
+
+    def rank_by(self, queryset, top_ids):
+        return order_by_rank(queryset, top_ids)
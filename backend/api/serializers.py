@@ -1,7 +1,39 @@
+from decimal import Decimal
 from django.contrib.auth.models import User
-from django.utils import timezone
+from django.db import transaction
+from django.db.models import F
 from rest_framework import serializers
-from .models import Categoria, Repuesto, UserProfile, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto
+from .models import Categoria, Repuesto, UserProfile, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto, Fitment, OutOfStock, reserve_stock
+from .pricing import coupon_discount, coupon_error
+
+
+class SparseFieldsetMixin:
+    """Drop output fields not listed in `context['fields']` (see `get_fieldset`)."""
+    expandable_fields = ()
+
+    @classmethod
+    def get_fieldset(cls, query_params):
+        """`?fields=id,name&expand=category` -> {'id', 'name', 'category'}; None means every field.
+
+        `expand` adds relations to `fields`; on its own it adds them to the default
+        fieldset, which already holds every field.
+        """
+        def csv(name):
+            return {part.strip() for part in query_params.get(name, '').split(',') if part.strip()}
+
+        known = set(cls.Meta.fields)
+        fields = csv('fields') & known
+        if not fields:
+            return None
+        return fields | (csv('expand') & set(cls.expandable_fields) & known)
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        fieldset = self.context.get('fields')
+        if fieldset:
+            for name in set(self.fields) - set(fieldset):
+                if not self.fields[name].write_only:
+                    self.fields.pop(name)
 
 
 class ImagenRepuestoSerializer(serializers.ModelSerializer):
@@ -175,13 +207,23 @@ class RegisterSerializer(serializers.ModelSerializer):
 
 
 class CategoriaSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = Categoria
+        fields = ('id', 'name', 'slug', 'description', 'product_count', 'in_stock_count', 'min_price', 'max_price')
+        read_only_fields = ('product_count', 'in_stock_count', 'min_price', 'max_price')
+
+
+class CategoriaRefSerializer(serializers.ModelSerializer):
+    """Category as nested in a Repuesto, without the catalog counters."""
+
     class Meta:
         model = Categoria
         fields = ('id', 'name', 'slug', 'description')
 
 
-class RepuestoSerializer(serializers.ModelSerializer):
-    category = CategoriaSerializer(read_only=True)
+class RepuestoSerializer(SparseFieldsetMixin, serializers.ModelSerializer):
+    expandable_fields = ('category', 'imagenes')
+    category = CategoriaRefSerializer(read_only=True)
     category_id = serializers.PrimaryKeyRelatedField(
         source='category', queryset=Categoria.objects.all(), write_only=True
     )
@@ -191,17 +233,46 @@ class RepuestoSerializer(serializers.ModelSerializer):
     class Meta:
         model = Repuesto
         fields = (
-            'id', 'name', 'brand', 'model', 'year', 'sku', 'description', 'price', 'stock', 'image', 'imagenes', 'category', 'category_id', 'created_at', 'updated_at'
+            'id', 'name', 'brand', 'model', 'year', 'sku', 'description', 'price', 'stock', 'image', 'imagenes', 'category', 'category_id', 'rating_avg', 'rating_count', 'created_at', 'updated_at'
         )
-        read_only_fields = ('created_at', 'updated_at')
+        read_only_fields = ('rating_avg', 'rating_count', 'created_at', 'updated_at')
+
+
+class FitmentSerializer(serializers.ModelSerializer):
+    repuesto = serializers.PrimaryKeyRelatedField(queryset=Repuesto.objects.all())
+
+    class Meta:
+        model = Fitment
+        fields = ('id', 'repuesto', 'brand', 'model', 'year_from', 'year_to', 'primary')
+        read_only_fields = ('id', 'primary')
+
+    def validate(self, attrs):
+        year_from = attrs.get('year_from', getattr(self.instance, 'year_from', None))
+        year_to = attrs.get('year_to', getattr(self.instance, 'year_to', None))
+        if year_from and year_to and year_from > year_to:
+            raise serializers.ValidationError('El año inicial no puede ser mayor al año final.')
+        return attrs
 
 
 class OrderItemSerializer(serializers.ModelSerializer):
-    repuesto_id = serializers.PrimaryKeyRelatedField(source='repuesto', queryset=Repuesto.objects.all(), write_only=True, required=False)
+    # Resolved for the whole cart in one query by OrderSerializer.validate_items.
+    repuesto_id = serializers.IntegerField(min_value=1, write_only=True, required=False, allow_null=True)
 
     class Meta:
         model = OrderItem
         fields = ('id', 'repuesto_id', 'name', 'sku', 'price', 'qty', 'brand', 'model', 'year')
+        # Catalog lines take both from the repuesto; only lines without repuesto_id must send them.
+        extra_kwargs = {'name': {'required': False}, 'price': {'required': False}}
+
+    def validate(self, attrs):
+        if not attrs.get('repuesto_id'):
+            missing = {
+                field: 'Requerido para items sin repuesto_id.'
+                for field in ('name', 'price') if attrs.get(field) in (None, '')
+            }
+            if missing:
+                raise serializers.ValidationError(missing)
+        return attrs
 
 
 class OrderSerializer(serializers.ModelSerializer):
@@ -223,56 +294,74 @@ class OrderSerializer(serializers.ModelSerializer):
     def get_user(self, obj):
         return {'id': obj.user.id, 'username': obj.user.username} if obj.user else None
 
+    def validate_items(self, items):
+        ids = {item['repuesto_id'] for item in items if item.get('repuesto_id')}
+        repuestos = Repuesto.objects.in_bulk(ids)
+        missing = sorted(ids - set(repuestos))
+        if missing:
+            raise serializers.ValidationError(f'Repuesto inexistente: {", ".join(map(str, missing))}.')
+        for item in items:
+            item['repuesto'] = repuestos.get(item.pop('repuesto_id', None))
+        return items
+
+    @transaction.atomic
     def create(self, validated_data):
+        """Constant number of queries whatever the cart size: one stock UPDATE, one Order insert, one OrderItem bulk insert."""
         items_data = validated_data.pop('items', [])
         user = self.context['request'].user
         profile = getattr(user, 'profile', None)
 
-        # Validate stock before creating order
+        # Reserve stock first, with one conditional UPDATE, so parallel checkouts cannot oversell
+        quantities = {}
+        names = {}
         for item in items_data:
             repuesto = item.get('repuesto')
-            qty = item.get('qty') or 1
-            if repuesto and repuesto.stock < qty:
-                raise serializers.ValidationError(
-                    f'Stock insuficiente para {repuesto.name}. No hay suficiente stock disponible.'
-                )
+            if repuesto:
+                quantities[repuesto.pk] = quantities.get(repuesto.pk, 0) + (item.get('qty') or 1)
+                names[repuesto.pk] = repuesto.name
+        try:
+            reserve_stock(quantities)
+        except OutOfStock as exc:
+            raise serializers.ValidationError(
+                f'Stock insuficiente para {names[exc.repuesto_id]}. No hay suficiente stock disponible.'
+            )
 
-        subtotal = 0
+        items = []
+        subtotal = Decimal('0')
         for item in items_data:
             repuesto = item.get('repuesto')
-            price = item.get('price') or (repuesto.price if repuesto else 0)
+            # Catalog items are charged their current price, the same one /api/cart/quote/ shows;
+            # the client's price only applies to lines without a repuesto.
+            price = repuesto.price if repuesto else (item.get('price') or 0)
             qty = item.get('qty') or 1
-            subtotal += float(price) * qty
+            subtotal += Decimal(price) * qty
+            items.append(OrderItem(
+                repuesto=repuesto,
+                name=item.get('name') or (repuesto.name if repuesto else ''),
+                sku=item.get('sku') or (repuesto.sku if repuesto else None),
+                price=price,
+                qty=qty,
+                brand=item.get('brand') or (repuesto.brand if repuesto else ''),
+                model=item.get('model') or (repuesto.model if repuesto else ''),
+                year=item.get('year') or (repuesto.year if repuesto else None),
+            ))
 
         coupon = None
         coupon_code = (validated_data.get('coupon_code') or '').strip().upper()
         discount_amount = 0
         if coupon_code:
-            try:
-                coupon = Coupon.objects.get(code=coupon_code, active=True)
-            except Coupon.DoesNotExist:
-                raise serializers.ValidationError('Cupón inválido o inactivo')
-
-            now = timezone.now()
-            if now < coupon.valid_from or now > coupon.valid_to:
-                if now > coupon.valid_to and coupon.active:
-                    coupon.active = False
-                    coupon.save(update_fields=['active'])
-                raise serializers.ValidationError('Cupón expirado o no válido aún')
-
-            if coupon.usage_limit and coupon.times_used >= coupon.usage_limit:
-                raise serializers.ValidationError('Cupón agotado')
-
-            if coupon.discount_type == 'percent':
-                discount_amount = (subtotal * float(coupon.discount_value)) / 100
-            else:
-                discount_amount = float(coupon.discount_value)
-
-            discount_amount = min(discount_amount, subtotal)
+            # Read from the database, not the quote cache: times_used must be current here.
+            # Deactivating an expired coupon here would roll back with the order; ValidateCouponView queues it.
+            coupon = Coupon.objects.filter(code=coupon_code, active=True).first()
+            error = coupon_error(coupon)
+            if error:
+                raise serializers.ValidationError(error)
+            discount_amount = coupon_discount(coupon, subtotal)
 
         order = Order.objects.create(
             user=user,
             status='paid',
+            total=max(0, subtotal - discount_amount),
             phone=getattr(profile, 'phone', ''),
             dni=getattr(profile, 'dni', ''),
             address_line1=getattr(profile, 'address_line1', ''),
@@ -284,43 +373,42 @@ class OrderSerializer(serializers.ModelSerializer):
             coupon_code=coupon_code or None,
             discount_amount=discount_amount,
         )
-
-        total = 0
-        for item in items_data:
-            repuesto = item.get('repuesto')
-            price = item.get('price') or (repuesto.price if repuesto else 0)
-            qty = item.get('qty') or 1
-            total += float(price) * qty
-            
-            # Create order item
-            OrderItem.objects.create(
-                order=order,
-                repuesto=repuesto,
-                name=item.get('name') or (repuesto.name if repuesto else ''),
-                sku=item.get('sku') or (repuesto.sku if repuesto else None),
-                price=price,
-                qty=qty,
-                brand=item.get('brand') or (repuesto.brand if repuesto else ''),
-                model=item.get('model') or (repuesto.model if repuesto else ''),
-                year=item.get('year') or (repuesto.year if repuesto else None),
-            )
-            
-            # Reduce stock
-            if repuesto:
-                repuesto.stock -= qty
-                repuesto.save()
-
-        # Apply discount to total
-        discount = float(order.discount_amount or 0)
-        order.total = max(0, total - discount)
-        order.save()
+        for item in items:
+            item.order = order
+        OrderItem.objects.bulk_create(items)
 
         if coupon:
-            coupon.times_used = (coupon.times_used or 0) + 1
-            coupon.save()
+            Coupon.objects.filter(pk=coupon.pk).update(times_used=F('times_used') + 1)
         return order
 
 
+class CartQuoteItemSerializer(serializers.Serializer):
+    repuesto_id = serializers.IntegerField(min_value=1)
+    qty = serializers.IntegerField(min_value=1, default=1)
+
+
+class CartQuoteSerializer(serializers.Serializer):
+    items = CartQuoteItemSerializer(many=True, allow_empty=False, max_length=200)
+    coupon_code = serializers.CharField(required=False, allow_null=True, allow_blank=True, max_length=50)
+
+
+class OrderSummarySerializer(serializers.ModelSerializer):
+    """List row for `/api/orders/?view=summary`: no nested items, just their counts."""
+    user = serializers.SerializerMethodField()
+    item_count = serializers.IntegerField(read_only=True)
+    units = serializers.IntegerField(read_only=True)
+
+    get_user = OrderSerializer.get_user
+
+    class Meta:
+        model = Order
+        fields = (
+            'id', 'user', 'status', 'total', 'created_at', 'city', 'province',
+            'coupon_code', 'discount_amount', 'item_count', 'units',
+        )
+        read_only_fields = fields
+
+
 class NotificationSerializer(serializers.ModelSerializer):
     order_id = serializers.IntegerField(source='order.id', read_only=True)
 
@@ -0,0 +1,182 @@
+import heapq
+import math
+import mmap
+import os
+import struct
+import threading
+from array import array
+from bisect import bisect_left
+from collections import Counter
+
+from django.conf import settings
+
+from .search import tokenize
+
+MAGIC = b'SIMP'
+HEADER = struct.Struct('=4sIII')  # magic, format version, rows, neighbours per row
+FORMAT_VERSION = 1
+
+STOPWORDS = frozenset((
+    'a', 'al', 'con', 'de', 'del', 'el', 'en', 'la', 'las', 'lo', 'los', 'o', 'para', 'por',
+    'que', 'se', 'sin', 'su', 'sus', 'un', 'una', 'uno', 'y', 'x',
+))
+
+
+def stem(token):
+    """Strip Spanish plurals so "pastillas"/"pastilla" and "discos"/"disco" share a term."""
+    if len(token) > 4 and token.endswith('es') and token[-3] not in 'aeiou':
+        return token[:-2]
+    if len(token) > 3 and token.endswith('s'):
+        return token[:-1]
+    return token
+
+
+def document_terms(name, description, brand, model, year, category_id):
+    """Weighted term counts of one Repuesto. The name counts twice; vehicle and category are exact terms."""
+    terms = Counter()
+    for weight, text in ((2, name), (1, description)):
+        for token in tokenize(text):
+            if token not in STOPWORDS and not token.isdigit():
+                terms[stem(token)] += weight
+    for prefix, value in (('brand', brand), ('model', model)):
+        value = ' '.join(tokenize(value))
+        if value:
+            terms[f'{prefix}:{value}'] += 1
+    if year:
+        terms[f'year:{year}'] += 1
+    if category_id:
+        terms[f'category:{category_id}'] += 1
+    return terms
+
+
+def build_vectors(documents, max_df=0.5):
+    """L2-normalized TF-IDF vectors, {pk: [(term, weight), ...]}, from {pk: Counter}."""
+    total = len(documents)
+    df = Counter()
+    for terms in documents.values():
+        df.update(terms.keys())
+    # Terms in a single document cannot make two documents similar; terms in most of them barely do.
+    limit = max(2, max_df * total)
+    idf = {term: math.log(total / count) for term, count in df.items() if 1 < count <= limit}
+
+    vectors = {}
+    for pk, terms in documents.items():
+        vector = [(term, (1 + math.log(count)) * idf[term]) for term, count in terms.items() if term in idf]
+        norm = math.sqrt(sum(weight * weight for _, weight in vector))
+        if norm:
+            vectors[pk] = [(term, weight / norm) for term, weight in vector]
+    return vectors
+
+
+def nearest_neighbours(vectors, top_k, max_postings=200):
+    """Yield (pk, [(other pk, cosine), ...]) for every vector in pk order, best first.
+
+    Each document is scored on its own against an inverted index whose posting lists
+    keep only the `max_postings` heaviest entries of each term, which bounds the work
+    per document; rows are yielded as they are computed, so memory stays flat.
+    """
+    postings = {}
+    for pk, vector in vectors.items():
+        for term, weight in vector:
+            postings.setdefault(term, []).append((weight, pk))
+    for term, entries in postings.items():
+        if len(entries) > max_postings:
+            postings[term] = heapq.nlargest(max_postings, entries)
+
+    for pk in sorted(vectors):
+        scores = {}
+        get = scores.get
+        for term, weight in vectors[pk]:
+            for other_weight, other in postings[term]:
+                scores[other] = get(other, 0.0) + weight * other_weight
+        scores.pop(pk, None)
+        yield pk, heapq.nsmallest(top_k, scores.items(), key=lambda item: (-item[1], item[0]))
+
+
+def write_index(path, rows, top_k):
+    """Write (pk, neighbours) rows, sorted by pk, as int32/float32 arrays; replaces `path` atomically."""
+    ids = array('i')
+    neighbours = array('i')
+    scores = array('f')
+    for pk, hits in rows:
+        ids.append(pk)
+        padded = hits + [(0, 0.0)] * (top_k - len(hits))
+        neighbours.extend(other for other, _ in padded)
+        scores.extend(score for _, score in padded)
+
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+    tmp_path = f'{path}.tmp'
+    with open(tmp_path, 'wb') as handle:
+        handle.write(HEADER.pack(MAGIC, FORMAT_VERSION, len(ids), top_k))
+        ids.tofile(handle)
+        neighbours.tofile(handle)
+        scores.tofile(handle)
+    # Workers that already mapped the old file keep reading it until they notice the new one.
+    os.replace(tmp_path, path)
+    return len(ids)
+
+
+def index_path():
+    return str(settings.SIMILAR_PARTS_PATH)
+
+
+class SimilarPartsIndex:
+    """Read-only, memory-mapped view of the file written by `build_similar_parts`.
+
+    The OS page cache backs the mapping, so every gunicorn worker shares one copy.
+    The file is re-mapped when its mtime changes.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.loaded = None
+        self.arrays = None
+
+    def _load(self, path, stamp):
+        with open(path, 'rb') as handle:
+            mapped = mmap.mmap(handle.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, rows, top_k = HEADER.unpack_from(mapped)
+        if magic != MAGIC or version != FORMAT_VERSION:
+            raise ValueError(f'{path} no es un índice de repuestos similares válido')
+        view = memoryview(mapped)
+        offset = HEADER.size
+        ids = view[offset:offset + 4 * rows].cast('i')
+        offset += 4 * rows
+        neighbours = view[offset:offset + 4 * rows * top_k].cast('i')
+        offset += 4 * rows * top_k
+        scores = view[offset:offset + 4 * rows * top_k].cast('f')
+        self.arrays = (ids, neighbours, scores, top_k)
+        self.loaded = stamp
+
+    def ensure_fresh(self):
+        path = index_path()
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return False
+        stamp = (path, stat.st_mtime_ns, stat.st_size)
+        if stamp != self.loaded:
+            with self._lock:
+                if stamp != self.loaded:
+                    self._load(path, stamp)
+        return True
+
+    def similar(self, pk, limit=6):
+        """[(pk, cosine), ...] most similar first; empty when `pk` was not indexed."""
+        if not self.ensure_fresh():
+            return []
+        ids, neighbours, scores, top_k = self.arrays
+        row = bisect_left(ids, pk)
+        if row == len(ids) or ids[row] != pk:
+            return []
+        start = row * top_k
+        return [
+            (neighbours[i], scores[i])
+            for i in range(start, start + min(limit, top_k))
+            if neighbours[i]
+        ]
+
+
+similar_index = SimilarPartsIndex()
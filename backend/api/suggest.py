@@ -0,0 +1,142 @@
+import logging
+import re
+import threading
+from bisect import bisect_left
+
+from django.conf import settings
+from django.db import connection
+
+from . import caching
+from .search import fold_text
+
+PRODUCT, BRAND, MODEL = 0, 1, 2
+# Word starts considered inside a name, so "freno" also finds "Disco de freno".
+MAX_WORD_STARTS = 4
+MIN_WORD_LENGTH = 3
+SCAN_FACTOR = 25
+
+logger = logging.getLogger(__name__)
+
+_SKU_PUNCTUATION_RE = re.compile(r'[\W_]+', re.UNICODE)
+
+
+def normalize(value):
+    return ' '.join(fold_text(value).split())
+
+
+class SuggestIndex:
+    """Sorted array of normalized keys, searched with bisect for typeahead.
+
+    Keys are names (plus a few word starts), SKUs (with and without punctuation),
+    brands and models. Built on first use; when the shared Repuesto version moves it is
+    rebuilt in a background thread while the previous one keeps answering, so stock,
+    price or review writes never stall a keystroke. `SUGGEST_MAX_ENTRIES` caps the number of keys so memory per worker stays bounded.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._rebuild_lock = threading.Lock()
+        self.keys = []
+        self.refs = []
+        self.targets = []
+        self.version = None
+        self.pending = False
+
+    def _shared_version(self):
+        from .models import Repuesto
+        return caching.get_versions([Repuesto])[0]
+
+    def rebuild(self):
+        from .models import Repuesto
+        version = self._shared_version()
+        max_entries = getattr(settings, 'SUGGEST_MAX_ENTRIES', 200000)
+        entries = []
+        targets = []
+        brands = {}
+        models = {}
+        queryset = Repuesto.objects.only('id', 'name', 'sku', 'brand', 'model').order_by('id')
+        for repuesto in queryset.iterator(chunk_size=2000):
+            if len(entries) >= max_entries:
+                break
+            ref = len(targets)
+            targets.append((PRODUCT, repuesto.pk, repuesto.name, repuesto.sku))
+            name = normalize(repuesto.name)
+            if name:
+                entries.append((name, ref))
+                words = name.split(' ')
+                starts = [i for i, word in enumerate(words) if i and len(word) >= MIN_WORD_LENGTH]
+                for i in starts[:MAX_WORD_STARTS]:
+                    entries.append((' '.join(words[i:]), ref))
+            if repuesto.sku:
+                sku = fold_text(repuesto.sku)
+                entries.append((sku, ref))
+                compact = _SKU_PUNCTUATION_RE.sub('', sku)
+                if compact != sku:
+                    entries.append((compact, ref))
+            for value, seen, kind in ((repuesto.brand, brands, BRAND), (repuesto.model, models, MODEL)):
+                key = normalize(value)
+                if key and key not in seen:
+                    seen[key] = len(targets)
+                    targets.append((kind, None, value.strip(), None))
+                    entries.append((key, seen[key]))
+
+        entries.sort()
+        keys = [key for key, _ in entries]
+        refs = [ref for _, ref in entries]
+        with self._lock:
+            self.keys, self.refs, self.targets, self.version = keys, refs, targets, version
+
+    def _rebuild_in_background(self):
+        try:
+            with self._rebuild_lock:
+                self.rebuild()
+        except Exception:
+            logger.exception('No se pudo reconstruir el índice de sugerencias')
+        finally:
+            self.pending = False
+            connection.close()
+
+    def ensure_fresh(self):
+        if self.version is None:
+            with self._rebuild_lock:
+                if self.version is None:
+                    self.rebuild()
+            return
+        if self.pending or self.version == self._shared_version():
+            return
+        with self._lock:
+            if self.pending:
+                return
+            self.pending = True
+        threading.Thread(target=self._rebuild_in_background, daemon=True).start()
+
+    def suggest(self, query, limit=8):
+        prefix = normalize(query)
+        if not prefix:
+            return {'products': [], 'brands': [], 'models': []}
+        self.ensure_fresh()
+
+        with self._lock:
+            keys, refs, targets = self.keys, self.refs, self.targets
+
+        products, brands, models = [], [], []
+        seen = set()
+        start = bisect_left(keys, prefix)
+        for position in range(start, min(start + limit * SCAN_FACTOR, len(keys))):
+            if not keys[position].startswith(prefix):
+                break
+            ref = refs[position]
+            if ref in seen:
+                continue
+            seen.add(ref)
+            kind, pk, label, sku = targets[ref]
+            if kind == PRODUCT and len(products) < limit:
+                products.append({'id': pk, 'name': label, 'sku': sku})
+            elif kind == BRAND and len(brands) < limit:
+                brands.append(label)
+            elif kind == MODEL and len(models) < limit:
+                models.append(label)
+        return {'products': products, 'brands': brands, 'models': models}
+
+
+suggest_index = SuggestIndex()
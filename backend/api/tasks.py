@@ -0,0 +1,15 @@
+from django.utils import timezone
+
+from . import models
+from .jobs import task
+
+
+@task('notify_stock_alerts')
+def send_stock_alerts(alerts):
+    """Fan a list of [repuesto_id, notification_type, message] out to every admin."""
+    models.notify_stock_alerts([tuple(alert) for alert in alerts])
+
+
+@task('deactivate_expired_coupons')
+def deactivate_expired_coupons():
+    return models.Coupon.objects.filter(active=True, valid_to__lt=timezone.now()).update(active=False)
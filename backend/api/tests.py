@@ -0,0 +1,106 @@
+from decimal import Decimal
+
+from django.contrib.auth.models import User
+from django.test import TestCase, override_settings
+from rest_framework.test import APIClient
+
+from . import caching
+from .models import Categoria, Order, OrderItem, Repuesto
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, JOBS_EAGER=False)
+class OrderQueryCountTests(TestCase):
+    """Checkout and order listings must cost the same number of queries whatever their size."""
+
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = User.objects.create_user('cliente', password='secret')
+        categoria = Categoria.objects.create(name='Frenos', slug='frenos')
+        # Stock well above every threshold, so no stock alert adds a query to some carts only.
+        cls.repuestos = [
+            Repuesto.objects.create(category=categoria, name=f'Repuesto {i}', sku=f'R-{i}', price=Decimal('10.50'), stock=1000)
+            for i in range(20)
+        ]
+        # The version row exists in any running deploy; create it so the first checkout does not pay for it.
+        caching.get_versions([Repuesto])
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def create_orders(self, count, items_per_order):
+        for _ in range(count):
+            order = Order.objects.create(user=self.user, total=Decimal('10.50') * items_per_order)
+            OrderItem.objects.bulk_create(
+                OrderItem(order=order, repuesto=repuesto, name=repuesto.name, sku=repuesto.sku, price=repuesto.price)
+                for repuesto in self.repuestos[:items_per_order]
+            )
+
+    def test_checkout_query_count_does_not_grow_with_cart_size(self):
+        for size in (1, 5, 15):
+            with self.subTest(items=size):
+                # A fresh user each time, so the profile lookup is not served from the previous request's cache.
+                self.client.force_authenticate(User.objects.get(pk=self.user.pk))
+                items = [
+                    {'repuesto_id': repuesto.pk, 'name': repuesto.name, 'price': str(repuesto.price), 'qty': 2}
+                    for repuesto in self.repuestos[:size]
+                ]
+                # Includes the after-commit search indexing of the new order and the Repuesto version bump.
+                with self.assertNumQueries(16), self.captureOnCommitCallbacks(execute=True):
+                    response = self.client.post('/api/orders/', {'items': items}, format='json')
+                self.assertEqual(response.status_code, 201, response.data)
+                self.assertEqual(len(response.data['items']), size)
+
+    def assert_list_queries(self, params, page_queries):
+        for orders, items_per_order in ((1, 1), (12, 3), (30, 10)):
+            with self.subTest(params=params, orders=orders, items=items_per_order):
+                Order.objects.all().delete()
+                self.create_orders(orders, items_per_order)
+                with self.assertNumQueries(page_queries):
+                    response = self.client.get('/api/orders/', params)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(len(response.data['results']), min(orders, 12))
+
+    def test_page_mode_query_count(self):
+        # COUNT, orders with their user, one prefetch for every item on the page.
+        self.assert_list_queries({}, 3)
+
+    def test_cursor_mode_query_count(self):
+        # No COUNT in keyset mode.
+        self.assert_list_queries({'cursor': ''}, 2)
+
+    def test_summary_query_count(self):
+        # Item counts are aggregated in the page query itself: COUNT plus one SELECT.
+        self.assert_list_queries({'view': 'summary'}, 2)
+        self.assert_list_queries({'view': 'summary', 'cursor': ''}, 1)
+
+
+@override_settings(SECURE_SSL_REDIRECT=False, JOBS_EAGER=False)
+class CartQuoteTests(TestCase):
+    def test_order_charges_the_quoted_total(self):
+        user = User.objects.create_user('cliente', password='secret')
+        categoria = Categoria.objects.create(name='Motor', slug='motor')
+        repuesto = Repuesto.objects.create(category=categoria, name='Filtro', sku='F-1', price=Decimal('30.00'), stock=50)
+        client = APIClient()
+        client.force_authenticate(user)
+        quote = client.post('/api/cart/quote/', {'items': [{'repuesto_id': repuesto.pk, 'qty': 3}]}, format='json')
+        # The cart still holds an older, lower price.
+        items = [{'repuesto_id': repuesto.pk, 'name': 'Filtro', 'price': '5.00', 'qty': 3}]
+        order = client.post('/api/orders/', {'items': items}, format='json')
+        self.assertEqual(order.status_code, 201, order.data)
+        self.assertEqual(quote.data['total'], '90.00')
+        self.assertEqual(order.data['total'], quote.data['total'])
+        self.assertEqual(order.data['items'][0]['price'], '30.00')
+
+    def test_catalog_lines_need_no_name_or_price(self):
+        user = User.objects.create_user('cliente', password='secret')
+        categoria = Categoria.objects.create(name='Motor', slug='motor')
+        repuesto = Repuesto.objects.create(category=categoria, name='Filtro', sku='F-1', price=Decimal('30.00'), stock=50)
+        client = APIClient()
+        client.force_authenticate(user)
+        order = client.post('/api/orders/', {'items': [{'repuesto_id': repuesto.pk, 'qty': 1}]}, format='json')
+        self.assertEqual(order.status_code, 201, order.data)
+        self.assertEqual(order.data['items'][0]['name'], 'Filtro')
+        custom = client.post('/api/orders/', {'items': [{'qty': 1}]}, format='json')
+        self.assertEqual(custom.status_code, 400)
+        self.assertEqual(set(custom.data['items'][0]), {'name', 'price'})
@@ -1,6 +1,6 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import RegisterView, MeView, ProfileView, CategoriaViewSet, RepuestoViewSet, OrderViewSet, NotificationViewSet, AdminAssistantView, FavoriteViewSet, ReviewViewSet, ValidateCouponView, ImagenRepuestoViewSet, DashboardStatsView, CouponViewSet
+from .views import RegisterView, MeView, ProfileView, CategoriaViewSet, RepuestoViewSet, OrderViewSet, NotificationViewSet, AdminAssistantView, FavoriteViewSet, ReviewViewSet, ValidateCouponView, CartQuoteView, ImagenRepuestoViewSet, DashboardStatsView, CouponViewSet, FitmentViewSet, CacheStatsView, CatalogExportView, OrderExportView
 
 router = DefaultRouter()
 router.register(r'categorias', CategoriaViewSet, basename='categoria')
@@ -11,6 +11,7 @@ router.register(r'favorites', FavoriteViewSet, basename='favorites')
 router.register(r'reviews', ReviewViewSet, basename='reviews')
 router.register(r'imagenes', ImagenRepuestoViewSet, basename='imagenes')
 router.register(r'coupons', CouponViewSet, basename='coupons')
+router.register(r'fitments', FitmentViewSet, basename='fitments')
 
 urlpatterns = [
     path('auth/register/', RegisterView.as_view(), name='auth_register'),
@@ -18,6 +19,10 @@ urlpatterns = [
     path('auth/profile/', ProfileView.as_view(), name='auth_profile'),
     path('admin/assistant/', AdminAssistantView.as_view(), name='admin_assistant'),
     path('admin/dashboard/', DashboardStatsView.as_view(), name='dashboard_stats'),
+    path('admin/cache-stats/', CacheStatsView.as_view(), name='cache_stats'),
+    path('admin/catalog-export/', CatalogExportView.as_view(), name='catalog_export'),
+    path('admin/order-export/', OrderExportView.as_view(), name='order_export'),
     path('coupons/validate/', ValidateCouponView.as_view(), name='validate_coupon'),
+    path('cart/quote/', CartQuoteView.as_view(), name='cart_quote'),
     path('', include(router.urls)),
 ]
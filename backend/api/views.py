@@ -1,14 +1,18 @@
 from rest_framework import generics, permissions, viewsets, parsers, status
-from rest_framework.exceptions import PermissionDenied
+from rest_framework.exceptions import NotFound, PermissionDenied
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.decorators import action
+from rest_framework.filters import OrderingFilter
 from django_filters import rest_framework as filters
 import re
 from django.contrib.auth.models import User
+from django.http import StreamingHttpResponse
 from django.utils import timezone
-from django.db.models import Sum, Count, Q, F, CharField
-from django.db.models.functions import Cast
+from django.db import IntegrityError, transaction
+from django.db.models import Sum, Count, Q, F
+from django.db.models.functions import Coalesce
+from collections import Counter
 from datetime import timedelta
 from .serializers import (
     UserSerializer,
@@ -17,13 +21,38 @@ from .serializers import (
     RepuestoSerializer,
     ProfileSerializer,
     OrderSerializer,
+    OrderSummarySerializer,
     NotificationSerializer,
     FavoriteSerializer,
     ReviewSerializer,
     CouponSerializer,
+    CartQuoteSerializer,
     ImagenRepuestoSerializer,
+    FitmentSerializer,
 )
-from .models import Categoria, Repuesto, UserProfile, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto
+from .models import Categoria, Repuesto, UserProfile, Order, OrderItem, Notification, Favorite, Review, Coupon, ImagenRepuesto, Fitment, CoPurchase, refresh_category_stats
+from .search import RepuestoSearchFilter
+from .order_search import search_orders
+from .exports import EXPORT_FORMATS, export_catalog, export_orders, parse_date_until, parse_updated_since
+from .imports import apply_feed_updates
+from .facets import facet_index, serialize_facets
+from .similar import similar_index
+from .suggest import suggest_index
+from .pagination import KeysetPagination
+from .idempotency import IdempotentCreateMixin
+from .jobs import enqueue
+from .pricing import quote_cart
+from .caching import CachedResponseMixin, ConditionalGetMixin, bump_version, get_stats as get_cache_stats, reset_stats as reset_cache_stats
+
+
+def parse_year_range(value):
+    """"2015" -> (2015, 2015); a partial year like "201" -> (2010, 2019). None if there are no digits."""
+    digits = ''.join(ch for ch in (value or '') if ch.isdigit())[:4]
+    if not digits:
+        return None
+    scale = 10 ** (4 - len(digits))
+    start = int(digits) * scale
+    return start, start + scale - 1
 
 
 class RegisterView(generics.CreateAPIView):
@@ -40,13 +69,8 @@ class OrderFilterSet(filters.FilterSet):
         fields = ['status']
     
     def search_filter(self, queryset, name, value):
-        """Search by user name, email, order id, or address"""
-        return queryset.filter(
-            Q(user__username__icontains=value) |
-            Q(user__email__icontains=value) |
-            Q(id=value) if value.isdigit() else Q() |
-            Q(address_line1__icontains=value)
-        )
+        """Search by order number, user name, email, DNI, phone, address or SKU (FTS index, prefix match, ranked)"""
+        return search_orders(queryset, value)
 
 
 class MeView(generics.RetrieveAPIView):
@@ -66,17 +90,33 @@ class ProfileView(generics.RetrieveUpdateAPIView):
         return profile
 
 
-class OrderViewSet(viewsets.ModelViewSet):
+class OrderViewSet(IdempotentCreateMixin, viewsets.ModelViewSet):
     serializer_class = OrderSerializer
+    idempotency_scope = 'orders'
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = KeysetPagination
     filter_backends = [filters.DjangoFilterBackend]
     filterset_class = OrderFilterSet
 
+    def is_summary(self):
+        return self.action == 'list' and self.request.query_params.get('view') == 'summary'
+
     def get_queryset(self):
         # Admins can see all orders, users only see their own
-        if self.request.user.is_staff:
-            return Order.objects.all().order_by('-created_at')
-        return Order.objects.filter(user=self.request.user).order_by('-created_at')
+        queryset = Order.objects.select_related('user')
+        if not self.request.user.is_staff:
+            queryset = queryset.filter(user=self.request.user)
+        if self.is_summary():
+            # One row per order, item counts aggregated in the same query
+            queryset = queryset.annotate(item_count=Count('items'), units=Coalesce(Sum('items__qty'), 0))
+        else:
+            queryset = queryset.prefetch_related('items')
+        return queryset.order_by('-created_at')
+
+    def get_serializer_class(self):
+        if self.is_summary():
+            return OrderSummarySerializer
+        return super().get_serializer_class()
 
     def perform_create(self, serializer):
         serializer.save()
@@ -97,6 +137,7 @@ class OrderViewSet(viewsets.ModelViewSet):
 class NotificationViewSet(viewsets.ReadOnlyModelViewSet):
     serializer_class = NotificationSerializer
     permission_classes = (permissions.IsAuthenticated,)
+    pagination_class = KeysetPagination
 
     def get_queryset(self):
         return Notification.objects.filter(user=self.request.user).order_by('-created_at')
@@ -162,7 +203,9 @@ class AdminAssistantView(APIView):
         match = re.search(r'subir\s+stock\s+a\s+todos\s*\+?(\d+)', message)
         if match:
             qty = int(match.group(1))
-            updated = Repuesto.objects.update(stock=models.F('stock') + qty)
+            updated = Repuesto.objects.update(stock=F('stock') + qty, updated_at=timezone.now())
+            bump_version(Repuesto)
+            refresh_category_stats()
             return Response({'ok': True, 'message': f'Se sumó stock +{qty} a {updated} productos.'})
 
         match = re.search(r'bajar\s+stock\s+a\s+todos\s*-?(\d+)', message)
@@ -171,14 +214,17 @@ class AdminAssistantView(APIView):
             updated = 0
             for repuesto in Repuesto.objects.all():
                 repuesto.stock = max(0, repuesto.stock - qty)
-                repuesto.save(update_fields=['stock'])
+                # auto_now only writes updated_at when it is listed; the catalog ETags depend on it.
+                repuesto.save(update_fields=['stock', 'updated_at'])
                 updated += 1
             return Response({'ok': True, 'message': f'Se restó stock -{qty} a {updated} productos.'})
 
         match = re.search(r'set\s+stock\s+a\s+todos\s+(\d+)', message)
         if match:
             qty = int(match.group(1))
-            updated = Repuesto.objects.update(stock=qty)
+            updated = Repuesto.objects.update(stock=qty, updated_at=timezone.now())
+            bump_version(Repuesto)
+            refresh_category_stats()
             return Response({'ok': True, 'message': f'Se fijó stock {qty} en {updated} productos.'})
 
         if 'ver total productos' in message or 'total productos' in message:
@@ -195,7 +241,8 @@ class AdminAssistantView(APIView):
         }, status=status.HTTP_400_BAD_REQUEST)
 
 
-class CategoriaViewSet(viewsets.ModelViewSet):
+class CategoriaViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (Categoria,)
     queryset = Categoria.objects.all()
     serializer_class = CategoriaSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
@@ -209,11 +256,17 @@ class CategoriaViewSet(viewsets.ModelViewSet):
         return [permissions.IsAuthenticatedOrReadOnly()]
 
 
-class RepuestoViewSet(viewsets.ModelViewSet):
+class RepuestoViewSet(ConditionalGetMixin, CachedResponseMixin, viewsets.ModelViewSet):
+    cache_models = (Repuesto, Categoria, ImagenRepuesto, Fitment)
+    # The trigram index refreshes in the background; caching would pin its stale answers.
+    uncached_params = ('fuzzy',)
+    etag_timestamp_fields = ('updated_at', 'category__updated_at')
     queryset = Repuesto.objects.select_related('category').all()
     serializer_class = RepuestoSerializer
     permission_classes = (permissions.IsAuthenticatedOrReadOnly,)
     parser_classes = (parsers.MultiPartParser, parsers.FormParser, parsers.JSONParser)
+    pagination_class = KeysetPagination
+    filter_backends = [filters.DjangoFilterBackend, RepuestoSearchFilter, OrderingFilter]
     filterset_fields = {
         'price': ['exact', 'lt', 'gt', 'lte', 'gte'],
         'stock': ['exact', 'lt', 'gt', 'lte', 'gte'],
@@ -221,35 +274,184 @@ class RepuestoViewSet(viewsets.ModelViewSet):
         'sku': ['exact'],
         'brand': ['icontains'],
         'model': ['icontains'],
+        'rating_avg': ['gte', 'lte'],
+        'rating_count': ['gte'],
     }
     search_fields = ('name', 'description', 'sku', 'brand', 'model')
-    ordering_fields = ('price', 'created_at', 'name', 'year')
+    ordering_fields = ('price', 'created_at', 'name', 'year', 'rating_avg', 'rating_count')
+    bulk_max_items = 300
+    bulk_update_max_items = 5000
+
+    def get_fieldset(self):
+        if self.request.method not in ('GET', 'HEAD') and self.action != 'bulk':
+            return None
+        return RepuestoSerializer.get_fieldset(self.request.query_params)
+
+    def get_serializer_context(self):
+        context = super().get_serializer_context()
+        context['fields'] = self.get_fieldset()
+        return context
 
     def get_queryset(self):
         qs = super().get_queryset()
+        if self.action in {'list', 'retrieve'}:
+            qs = self.project_queryset(qs, self.get_fieldset())
+
         brand = self.request.query_params.get('brand', '').strip()
         model = self.request.query_params.get('model', '').strip()
-        year = self.request.query_params.get('year', '').strip()
-
-        if brand:
-            qs = qs.filter(brand__icontains=brand)
-        if model:
-            qs = qs.filter(model__icontains=model)
-        if year:
-            year_digits = ''.join(ch for ch in year if ch.isdigit())
-            if len(year_digits) == 4:
-                qs = qs.filter(year=int(year_digits))
-            else:
-                qs = qs.annotate(year_str=Cast('year', CharField())).filter(year_str__startswith=year_digits or year)
+        year_range = parse_year_range(self.request.query_params.get('year', ''))
+
+        if brand or model or year_range:
+            fitments = Fitment.objects.matching(brand=brand, model=model, year_range=year_range)
+            qs = qs.filter(pk__in=fitments.values('repuesto_id'))
 
         return qs
 
+    @action(detail=False, methods=['post'])
+    def bulk(self, request):
+        """Fresh data for many repuestos at once: `{"ids": [...], "skus": [...]}`, order preserved."""
+        ids = request.data.get('ids') or []
+        skus = request.data.get('skus') or []
+        if not isinstance(ids, list) or not isinstance(skus, list):
+            return Response({'detail': '"ids" y "skus" deben ser listas.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(ids) + len(skus) > self.bulk_max_items:
+            return Response(
+                {'detail': f'Máximo {self.bulk_max_items} productos por consulta.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            ids = list(dict.fromkeys(int(pk) for pk in ids))
+        except (TypeError, ValueError):
+            return Response({'detail': 'Los ids deben ser números.'}, status=status.HTTP_400_BAD_REQUEST)
+        skus = list(dict.fromkeys(str(sku).strip() for sku in skus if str(sku).strip()))
+
+        qs = self.project_queryset(self.get_queryset(), self.get_fieldset())
+        found = {}
+        for repuesto in qs.filter(Q(id__in=ids) | Q(sku__in=skus)):
+            found[repuesto.pk] = repuesto
+        by_sku = {repuesto.sku: repuesto for repuesto in found.values() if repuesto.sku}
+
+        ordered = [found[pk] for pk in ids if pk in found]
+        ordered += [by_sku[sku] for sku in skus if sku in by_sku and by_sku[sku].pk not in ids]
+        return Response({
+            'results': self.get_serializer(ordered, many=True).data,
+            'missing': {
+                'ids': [pk for pk in ids if pk not in found],
+                'skus': [sku for sku in skus if sku not in by_sku],
+            },
+        })
+
+    @action(detail=False, methods=['post'], url_path='bulk-update')
+    def bulk_update(self, request):
+        """Supplier/ERP feed: `[{"sku", "price"?, "stock"?, "stock_delta"?}, ...]` applied in one transaction."""
+        entries = request.data.get('items') if isinstance(request.data, dict) else request.data
+        if not isinstance(entries, list) or not entries:
+            return Response({'detail': 'Enviá una lista de items.'}, status=status.HTTP_400_BAD_REQUEST)
+        if len(entries) > self.bulk_update_max_items:
+            return Response(
+                {'detail': f'Máximo {self.bulk_update_max_items} items por solicitud.'},
+                status=status.HTTP_400_BAD_REQUEST,
+            )
+        try:
+            results, notifications = apply_feed_updates(entries)
+        except IntegrityError:
+            # A concurrent sale pushed a stock_delta below zero; nothing was applied.
+            return Response(
+                {'detail': 'El stock cambió durante la actualización. Reintentá.'},
+                status=status.HTTP_409_CONFLICT,
+            )
+        summary = Counter(result['status'] for result in results)
+        return Response({'summary': dict(summary, notifications=notifications), 'results': results})
+
+    @action(detail=False, methods=['get'])
+    def facets(self, request):
+        """Counts per category, brand, model, year and price bucket for the current filters."""
+        ignored = {'page', 'page_size', 'cursor', 'ordering', 'fields', 'expand', 'fuzzy'}
+        filtered = any(value for key, value in request.query_params.items() if key not in ignored)
+        ids = None
+        if filtered:
+            ids = list(self.filter_queryset(self.get_queryset()).order_by().values_list('id', flat=True))
+        total, counts = facet_index.counts_for(ids)
+        categories = Categoria.objects.in_bulk(list(counts['category']))
+        return Response(serialize_facets(total, counts, categories))
+
+    @action(detail=False, methods=['get'])
+    def suggest(self, request):
+        """Typeahead over names, SKUs, brands and models, answered from the in-memory prefix index."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 8)), 1), 20)
+        except ValueError:
+            limit = 8
+        return Response(suggest_index.suggest(request.query_params.get('q', ''), limit=limit))
+
+    @action(detail=True, methods=['get'], url_path='bought-together')
+    def bought_together(self, request, pk=None):
+        """Repuestos most often bought in the same orders, precomputed by `build_recommendations`."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 6)), 1), 20)
+        except ValueError:
+            limit = 6
+        if not pk.isdigit():
+            raise NotFound()
+        fieldset = self.get_fieldset()
+        rows = CoPurchase.objects.filter(repuesto_id=pk).select_related('related__category').order_by('rank')
+        if fieldset is None or 'imagenes' in fieldset:
+            rows = rows.prefetch_related('related__imagenes')
+        related = [row.related for row in rows[:limit]]
+        return Response({'results': self.get_serializer(related, many=True).data})
+
+    @action(detail=True, methods=['get'])
+    def similar(self, request, pk=None):
+        """Repuestos with the closest name/description/vehicle/category, from the `build_similar_parts` file."""
+        try:
+            limit = min(max(int(request.query_params.get('limit', 6)), 1), 20)
+        except ValueError:
+            limit = 6
+        ids = [other for other, _ in similar_index.similar(int(pk), limit)] if pk.isdigit() else []
+        found = self.project_queryset(Repuesto.objects.select_related('category'), self.get_fieldset()).in_bulk(ids)
+        return Response({'results': self.get_serializer([found[i] for i in ids if i in found], many=True).data})
+
+    def project_queryset(self, qs, fieldset):
+        """Load only the columns and relations the requested fieldset will serialize."""
+        if fieldset is None or 'imagenes' in fieldset:
+            qs = qs.prefetch_related('imagenes')
+        if fieldset is None:
+            return qs
+        if 'category' not in fieldset:
+            qs = qs.select_related(None)
+        concrete = {f.name for f in Repuesto._meta.concrete_fields}
+        # Ordering columns stay loaded so keyset cursors never hit a deferred field.
+        columns = {'id', *self.ordering_fields, *(fieldset & concrete)}
+        return qs.only(*columns)
+
     def get_permissions(self):
-        if self.action in {'create', 'update', 'partial_update', 'destroy'}:
+        if self.action in {'create', 'update', 'partial_update', 'destroy', 'bulk_update'}:
             return [permissions.IsAdminUser()]
+        if self.action == 'bulk':
+            return [permissions.AllowAny()]
         return [permissions.IsAuthenticatedOrReadOnly()]
 
 
+class FitmentViewSet(viewsets.ModelViewSet):
+    """Vehicle fitments. `?brand=toyota&model=corolla&year=2015` lists what fits that vehicle."""
+    serializer_class = FitmentSerializer
+    filter_backends = [filters.DjangoFilterBackend]
+    filterset_fields = ('repuesto',)
+
+    def get_queryset(self):
+        params = self.request.query_params
+        return Fitment.objects.matching(
+            brand=params.get('brand', '').strip(),
+            model=params.get('model', '').strip(),
+            year_range=parse_year_range(params.get('year', '')),
+        ).order_by('brand_key', 'model_key', 'year_from', 'id')
+
+    def get_permissions(self):
+        if self.action in {'create', 'update', 'partial_update', 'destroy'}:
+            return [permissions.IsAdminUser()]
+        return [permissions.AllowAny()]
+
+
 class CouponViewSet(viewsets.ModelViewSet):
     queryset = Coupon.objects.all()
     serializer_class = CouponSerializer
@@ -288,19 +490,32 @@ class ReviewViewSet(viewsets.ModelViewSet):
             return Review.objects.filter(repuesto_id=repuesto_id).select_related('user')
         return Review.objects.select_related('user', 'repuesto')
 
+    # rating_total / rating_count / rating_avg follow through the Review signals in models.py.
     def perform_create(self, serializer):
-        serializer.save(user=self.request.user)
+        with transaction.atomic():
+            serializer.save(user=self.request.user)
+
+    def perform_update(self, serializer):
+        with transaction.atomic():
+            serializer.save()
+
+    def perform_destroy(self, instance):
+        with transaction.atomic():
+            # A queryset delete only signals rows it still finds, so a concurrent delete is not subtracted twice.
+            Review.objects.filter(pk=instance.pk).delete()
 
     def create(self, request, *args, **kwargs):
         serializer = self.get_serializer(data=request.data)
         serializer.is_valid(raise_exception=True)
         repuesto = serializer.validated_data.get('repuesto')
-        existing = Review.objects.filter(user=request.user, repuesto=repuesto).first()
 
+        with transaction.atomic():
+            existing = Review.objects.select_for_update().filter(user=request.user, repuesto=repuesto).first()
+            if existing:
+                existing.rating = serializer.validated_data.get('rating', existing.rating)
+                existing.comment = serializer.validated_data.get('comment', existing.comment)
+                existing.save()
         if existing:
-            existing.rating = serializer.validated_data.get('rating', existing.rating)
-            existing.comment = serializer.validated_data.get('comment', existing.comment)
-            existing.save()
             out = self.get_serializer(existing)
             return Response(out.data, status=status.HTTP_200_OK)
 
@@ -348,9 +563,8 @@ class ValidateCouponView(APIView):
         
         now = timezone.now()
         if now < coupon.valid_from or now > coupon.valid_to:
-            if now > coupon.valid_to and coupon.active:
-                coupon.active = False
-                coupon.save(update_fields=['active'])
+            if now > coupon.valid_to:
+                enqueue('deactivate_expired_coupons')
             return Response({'error': 'Cupón expirado o no válido aún'}, status=status.HTTP_400_BAD_REQUEST)
         
         if coupon.usage_limit and coupon.times_used >= coupon.usage_limit:
@@ -359,6 +573,16 @@ class ValidateCouponView(APIView):
         return Response(CouponSerializer(coupon).data, status=status.HTTP_200_OK)
 
 
+class CartQuoteView(APIView):
+    """Price a cart without creating the order: current prices, stock, coupon discount and total."""
+    permission_classes = (permissions.AllowAny,)
+
+    def post(self, request):
+        serializer = CartQuoteSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        return Response(quote_cart(serializer.validated_data['items'], serializer.validated_data.get('coupon_code')))
+
+
 class ImagenRepuestoViewSet(viewsets.ModelViewSet):
     serializer_class = ImagenRepuestoSerializer
     permission_classes = (permissions.IsAdminUser,)
@@ -368,6 +592,70 @@ class ImagenRepuestoViewSet(viewsets.ModelViewSet):
         serializer.save()
 
 
+class CacheStatsView(APIView):
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        return Response(get_cache_stats())
+
+    def delete(self, request):
+        reset_cache_stats()
+        return Response(get_cache_stats())
+
+
+def export_response(chunks, basename, export_format, compress):
+    """StreamingHttpResponse download for the byte chunks of an api.exports export."""
+    filename = f'{basename}.{export_format}'
+    content_type = 'text/csv; charset=utf-8' if export_format == 'csv' else 'application/x-ndjson; charset=utf-8'
+    if compress:
+        filename += '.gz'
+        content_type = 'application/gzip'
+    response = StreamingHttpResponse(chunks, content_type=content_type)
+    response['Content-Disposition'] = f'attachment; filename="{filename}"'
+    return response
+
+
+class CatalogExportView(APIView):
+    """Whole catalog as a streamed CSV/NDJSON download: `?output=csv|ndjson&updated_since=2026-01-01&gzip=1`."""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        export_format = request.query_params.get('output', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response({'detail': 'Formato inválido. Usá csv o ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            updated_since = parse_updated_since(request.query_params.get('updated_since'))
+        except ValueError:
+            return Response({'detail': 'updated_since debe ser una fecha ISO (AAAA-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+
+        chunks = export_catalog(export_format, updated_since, compress, absolute_url=request.build_absolute_uri)
+        return export_response(chunks, 'catalogo', export_format, compress)
+
+
+class OrderExportView(APIView):
+    """Every order with its items, streamed oldest first: `?output=csv|ndjson&from=2026-09-01&to=2026-09-30&status=paid,shipped&gzip=1`."""
+    permission_classes = (permissions.IsAdminUser,)
+
+    def get(self, request):
+        export_format = request.query_params.get('output', 'csv').lower()
+        if export_format not in EXPORT_FORMATS:
+            return Response({'detail': 'Formato inválido. Usá csv o ndjson.'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            created_from = parse_updated_since(request.query_params.get('from'))
+            created_until = parse_date_until(request.query_params.get('to'))
+        except ValueError:
+            return Response({'detail': 'from y to deben ser fechas ISO (AAAA-MM-DD).'}, status=status.HTTP_400_BAD_REQUEST)
+        statuses = [value.strip() for value in request.query_params.get('status', '').split(',') if value.strip()]
+        unknown = set(statuses) - {choice for choice, _ in Order.STATUS_CHOICES}
+        if unknown:
+            return Response({'detail': f'Estado inválido: {", ".join(sorted(unknown))}.'}, status=status.HTTP_400_BAD_REQUEST)
+        compress = request.query_params.get('gzip', '').lower() in ('1', 'true')
+
+        chunks = export_orders(export_format, created_from, created_until, statuses, compress)
+        return export_response(chunks, 'ordenes', export_format, compress)
+
+
 class DashboardStatsView(APIView):
     permission_classes = (permissions.IsAdminUser,)
 
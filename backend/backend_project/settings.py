@@ -2,6 +2,8 @@ import os
 from pathlib import Path
 from datetime import timedelta
 
+from corsheaders.defaults import default_headers
+
 BASE_DIR = Path(__file__).resolve().parent.parent
 
 # Security: SECRET_KEY must be set in environment
@@ -83,6 +85,9 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': BASE_DIR / 'db.sqlite3',
+        # Writers take the lock at BEGIN and wait for it, instead of failing with
+        # "database is locked" when two checkouts upgrade their read locks at once.
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE', 'timeout': 20},
     }
 }
 
@@ -151,6 +156,49 @@ if USE_S3_MEDIA:
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
+# ==================== Cache Configuration ====================
+# CATALOG_CACHE picks the backend for public catalog responses:
+#   locmem (default, per process), file (shared by every gunicorn worker on the host)
+#   or db (SQLite table, run `python manage.py createcachetable` first).
+# Model versions live in the database (api.CacheVersion), so writes from run_worker or
+# manage.py commands invalidate every backend; file or db only share the entries themselves.
+CATALOG_CACHE = os.environ.get('CATALOG_CACHE', 'locmem')
+CATALOG_CACHE_TIMEOUT = int(os.environ.get('CATALOG_CACHE_TIMEOUT', '300'))
+# Coupons looked up by /api/cart/quote/; short because times_used changes without a version bump.
+COUPON_CACHE_TIMEOUT = int(os.environ.get('COUPON_CACHE_TIMEOUT', '60'))
+CATALOG_CACHE_MAX_ENTRIES = int(os.environ.get('CATALOG_CACHE_MAX_ENTRIES', '5000'))
+
+_catalog_cache_backends = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'catalog',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': os.environ.get('CATALOG_CACHE_LOCATION', str(BASE_DIR / 'cache')),
+    },
+    'db': {
+        'BACKEND': 'django.core.cache.backends.db.DatabaseCache',
+        'LOCATION': 'api_cache_table',
+    },
+}
+if CATALOG_CACHE not in _catalog_cache_backends:
+    raise ValueError(f"CATALOG_CACHE must be one of: {', '.join(_catalog_cache_backends)}")
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'catalog': {
+        **_catalog_cache_backends[CATALOG_CACHE],
+        'TIMEOUT': CATALOG_CACHE_TIMEOUT,
+        'OPTIONS': {'MAX_ENTRIES': CATALOG_CACHE_MAX_ENTRIES},
+    },
+}
+
+# Memory-mapped file written by `python manage.py build_similar_parts`.
+SIMILAR_PARTS_PATH = os.environ.get('SIMILAR_PARTS_PATH', str(BASE_DIR / 'data' / 'similar_parts.bin'))
+
 # ==================== CORS Configuration ====================
 CORS_ALLOWED_ORIGINS = _env_list('CORS_ALLOWED_ORIGINS')
 
@@ -184,6 +232,23 @@ CORS_ALLOW_METHODS = [
     'POST',
     'PUT',
 ]
+CORS_ALLOW_HEADERS = (*default_headers, 'idempotency-key')
+
+# Seconds a checkout Idempotency-Key is remembered (see api.idempotency).
+IDEMPOTENCY_KEY_TTL = int(os.environ.get('IDEMPOTENCY_KEY_TTL', str(24 * 3600)))
+# Seconds a key stays claimed by a request still in flight: a few times gunicorn's 30 s
+# timeout, after which a retry may take it over.
+IDEMPOTENCY_LEASE_TTL = int(os.environ.get('IDEMPOTENCY_LEASE_TTL', '120'))
+
+# Background jobs (api.jobs, `python manage.py run_worker`). JOBS_EAGER runs them inline after commit.
+JOBS_EAGER = os.environ.get('JOBS_EAGER', 'False') == 'True'
+JOBS_WORKER_CONCURRENCY = int(os.environ.get('JOBS_WORKER_CONCURRENCY', '4'))
+JOBS_WORKER_POOL = os.environ.get('JOBS_WORKER_POOL', 'thread')
+JOBS_MAX_ATTEMPTS = int(os.environ.get('JOBS_MAX_ATTEMPTS', '5'))
+JOBS_BACKOFF_BASE = int(os.environ.get('JOBS_BACKOFF_BASE', '10'))
+JOBS_BACKOFF_MAX = int(os.environ.get('JOBS_BACKOFF_MAX', '3600'))
+JOBS_LOCK_TIMEOUT = int(os.environ.get('JOBS_LOCK_TIMEOUT', '600'))
+JOBS_KEEP_DONE_DAYS = int(os.environ.get('JOBS_KEEP_DONE_DAYS', '7'))
 
 # ==================== REST Framework Configuration ====================
 REST_FRAMEWORK = {
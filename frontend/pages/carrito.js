@@ -1,4 +1,4 @@
-import { useEffect, useMemo, useState } from 'react'
+import { useEffect, useMemo, useRef, useState } from 'react'
 import Navbar from '../components/Navbar'
 import Footer from '../components/Footer'
 import { useCart } from '../context/CartContext'
@@ -17,6 +17,9 @@ export default function CartPage() {
   const [couponCode, setCouponCode] = useState('')
   const [coupon, setCoupon] = useState(null)
   const [couponError, setCouponError] = useState('')
+  // Same cart + same key on retry, so a timed-out checkout is not charged twice.
+  const checkoutAttempt = useRef(null)
+  const [quote, setQuote] = useState(null)
 
   const hasItems = items.length > 0
   const formatted = useMemo(() => {
@@ -99,12 +102,45 @@ export default function CartPage() {
     }
   }
 
-  const discount = coupon
-    ? coupon.discount_type === 'percent'
-      ? (summary.subtotal * coupon.discount_value) / 100
-      : Number(coupon.discount_value)
-    : 0
-  const totalWithDiscount = Math.max(0, summary.total - discount)
+  // Server-side pricing (current prices, stock and coupon), refreshed shortly after each cart change.
+  useEffect(() => {
+    if (!hasItems) {
+      setQuote(null)
+      return
+    }
+    const controller = new AbortController()
+    const timer = setTimeout(async () => {
+      try {
+        const res = await fetch(`${API_BASE}/cart/quote/`, {
+          method: 'POST',
+          headers: { 'Content-Type': 'application/json' },
+          body: JSON.stringify({
+            items: items.map(i => ({ repuesto_id: i.id, qty: i.qty })),
+            coupon_code: coupon?.code || null,
+          }),
+          signal: controller.signal,
+        })
+        if (res.ok) setQuote(await res.json())
+      } catch (e) {
+        if (e.name !== 'AbortError') setQuote(null)
+      }
+    }, 300)
+    return () => {
+      clearTimeout(timer)
+      controller.abort()
+    }
+  }, [items, coupon, hasItems])
+
+  const quoteLines = Object.fromEntries((quote?.items || []).map(line => [line.repuesto_id, line]))
+  const discount = quote
+    ? Number(quote.discount)
+    : coupon
+      ? coupon.discount_type === 'percent'
+        ? (summary.subtotal * coupon.discount_value) / 100
+        : Number(coupon.discount_value)
+      : 0
+  const subtotal = quote ? Number(quote.subtotal) : summary.subtotal
+  const totalWithDiscount = quote ? Number(quote.total) : Math.max(0, summary.total - discount)
 
   async function handlePay() {
     if (!user) return
@@ -112,19 +148,20 @@ export default function CartPage() {
     
     try {
       // Validate stock for all items before proceeding
-      const stockValidation = await Promise.all(
-        items.map(async (item) => {
-          const res = await fetch(`${API_BASE}/repuestos/${item.id}/`)
-          const data = await res.json()
-          return {
-            id: item.id,
-            name: item.name,
-            requestedQty: item.qty,
-            availableStock: data.stock,
-            hasStock: data.stock >= item.qty
-          }
-        })
-      )
+      const stockRes = await fetch(`${API_BASE}/repuestos/bulk/?fields=id,stock`, {
+        method: 'POST',
+        headers: { 'Content-Type': 'application/json' },
+        body: JSON.stringify({ ids: items.map(i => i.id) }),
+      })
+      const stockData = await stockRes.json()
+      const stockById = Object.fromEntries((stockData.results || []).map(p => [p.id, p.stock]))
+      const stockValidation = items.map(item => ({
+        id: item.id,
+        name: item.name,
+        requestedQty: item.qty,
+        availableStock: stockById[item.id] ?? 0,
+        hasStock: (stockById[item.id] ?? 0) >= item.qty
+      }))
       
       const outOfStock = stockValidation.filter(v => !v.hasStock)
       
@@ -147,23 +184,31 @@ export default function CartPage() {
         coupon_code: coupon?.code || null,
         discount_amount: discount || 0,
       }
+      const body = JSON.stringify(payload)
+      if (!checkoutAttempt.current || checkoutAttempt.current.body !== body) {
+        checkoutAttempt.current = { body, key: crypto.randomUUID() }
+      }
       const res = await fetchWithAuth('/orders/', {
         method: 'POST',
-        headers: { 'Content-Type': 'application/json' },
-        body: JSON.stringify(payload),
+        headers: { 'Content-Type': 'application/json', 'Idempotency-Key': checkoutAttempt.current.key },
+        body,
       })
       
       if (!res.ok) {
         const errorData = await res.json()
         if (errorData.items && errorData.items[0]) {
           showToast(errorData.items[0], 'error')
+        } else if (errorData.detail) {
+          showToast(errorData.detail, 'error')
         } else {
           throw new Error('Error orden')
         }
         return
       }
       
-      showToast(`Pago realizado con éxito. Total: $${totalWithDiscount.toFixed(2)}`, 'success')
+      const order = await res.json()
+      showToast(`Pago realizado con éxito. Total: $${Number(order.total).toFixed(2)}`, 'success')
+      checkoutAttempt.current = null
       clear()
       setCoupon(null)
       setCouponCode('')
@@ -207,6 +252,9 @@ export default function CartPage() {
                       <button onClick={() => updateQty(item.id, item.qty + 1)} className="px-2 py-1 rounded border border-white/10 text-gray-200">+</button>
                     </div>
                     <p className="text-sm text-gray-300">Subtotal: ${item.lineTotal.toFixed(2)}</p>
+                    {quoteLines[item.id] && !quoteLines[item.id].available && (
+                      <p className="text-xs text-red-400">Stock disponible: {quoteLines[item.id].stock}</p>
+                    )}
                     <button onClick={() => removeItem(item.id)} className="text-sm text-red-400">Quitar</button>
                   </div>
                 </div>
@@ -253,7 +301,7 @@ export default function CartPage() {
               <div className="mt-4 space-y-2 text-gray-300 text-sm">
                 <div className="flex justify-between">
                   <span>Subtotal</span>
-                  <span>${summary.subtotal.toFixed(2)}</span>
+                  <span>${subtotal.toFixed(2)}</span>
                 </div>
                 <div className="flex justify-between">
                   <span>Impuestos</span>